@@ -4,15 +4,21 @@ Flask-based Distributed Voting System
 Simplified version with admin controls and real-time notifications
 """
 
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify, flash
+import json
 import threading
 import time
 from datetime import datetime
 from collections import deque
 import logging
 
+from async_logging import configure_logging
+from sharded_counter import ShardedCounter
+from voter_store import VoterStore, default_voters
+
 # Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Log records are written by a background listener, never on the calling thread
+configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -24,18 +30,7 @@ results_published = False
 current_voting_session = 1
 
 # In-memory storage
-VOTERS_DB = [
-    {"id": 1, "name": "Alice", "has_voted": False, "vote": None},
-    {"id": 2, "name": "Bob", "has_voted": False, "vote": None},
-    {"id": 3, "name": "Charlie", "has_voted": False, "vote": None},
-    {"id": 4, "name": "Diana", "has_voted": False, "vote": None},
-    {"id": 5, "name": "Eve", "has_voted": False, "vote": None},
-    {"id": 6, "name": "Frank", "has_voted": False, "vote": None},
-    {"id": 7, "name": "Grace", "has_voted": False, "vote": None},
-    {"id": 8, "name": "Henry", "has_voted": False, "vote": None},
-    {"id": 9, "name": "Ivy", "has_voted": False, "vote": None},
-    {"id": 10, "name": "Jack", "has_voted": False, "vote": None}
-]
+VOTERS_DB = VoterStore(default_voters())
 
 CANDIDATES = [
     "Candidate A", "Candidate B", "Candidate C", "Candidate D", "Candidate E",
@@ -43,7 +38,7 @@ CANDIDATES = [
 ]
 
 # Tally server data
-VOTES = {}  # Real-time vote tracking: {candidate: count}
+VOTES = ShardedCounter(CANDIDATES)  # Real-time vote tracking: {candidate: count}
 VOTED_USERS = set()  # Track who has voted to prevent re-voting
 
 # Voting history - stores all past voting sessions
@@ -53,9 +48,18 @@ VOTING_HISTORY = []  # List of completed voting sessions
 NOTIFICATIONS = deque(maxlen=50)
 notification_lock = threading.Lock()
 
-# Initialize vote counts
-for candidate in CANDIDATES:
-    VOTES[candidate] = 0
+# Server-Sent Events: notifications and state changes, each with an increasing id
+EVENTS = deque(maxlen=200)
+event_seq = 0
+event_cond = threading.Condition(notification_lock)
+SSE_KEEPALIVE_SECONDS = 15
+
+def _publish_event(event, data):
+    """Append an event for SSE subscribers and wake them (caller holds notification_lock)"""
+    global event_seq
+    event_seq += 1
+    EVENTS.append({"id": event_seq, "event": event, "data": data})
+    event_cond.notify_all()
 
 def add_notification(message):
     """Add a notification to the system log"""
@@ -64,28 +68,41 @@ def add_notification(message):
     
     with notification_lock:
         NOTIFICATIONS.append(notification)
-        logger.info(f"Notification: {message}")
+        _publish_event("notification", notification)
+    logger.info(f"Notification: {message}")
+
+def current_status():
+    """Voting state shared by /api/status and state-change events"""
+    return {
+        "voting_active": voting_active,
+        "results_published": results_published,
+        "total_votes": VOTES.total(),
+        "voted_users": len(VOTED_USERS)
+    }
+
+def publish_state_change():
+    """Push the current voting state to SSE subscribers"""
+    status = current_status()
+    with notification_lock:
+        _publish_event("state", status)
 
 def get_voter_by_credentials(name, voter_id):
     """Find voter by name and ID"""
-    for voter in VOTERS_DB:
-        if voter["name"] == name and voter["id"] == voter_id:
-            return voter
-    return None
+    return VOTERS_DB.find(name, voter_id)
 
 def update_vote_count(candidate):
     """Update real-time vote count"""
-    if candidate in VOTES:
-        VOTES[candidate] += 1
+    VOTES.increment(candidate)
 
 def save_current_session_to_history():
     """Save current voting session to history"""
     global current_voting_session
     
     # Calculate winner
+    votes_snapshot = VOTES.snapshot()
     winner = None
     max_votes = 0
-    for candidate, votes in VOTES.items():
+    for candidate, votes in votes_snapshot.items():
         if votes > max_votes:
             max_votes = votes
             winner = candidate
@@ -94,9 +111,9 @@ def save_current_session_to_history():
     session_record = {
         "session_id": current_voting_session,
         "start_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        "votes": VOTES.copy(),
+        "votes": votes_snapshot,
         "winner": winner,
-        "total_votes": sum(VOTES.values()),
+        "total_votes": sum(votes_snapshot.values()),
         "participants": list(VOTED_USERS.copy()),
         "voter_details": []
     }
@@ -128,8 +145,7 @@ def reset_current_session():
         voter["vote"] = None
     
     # Reset vote counts
-    for candidate in CANDIDATES:
-        VOTES[candidate] = 0
+    VOTES.reset()
     
     # Clear voted users
     VOTED_USERS.clear()
@@ -169,7 +185,7 @@ def main_view():
 
     # Check if voting is active
     if not voting_active:
-        return render_template('voting_inactive.html')
+        return render_template('voting_inactive.html', last_event_id=event_seq)
 
     return render_template('vote.html', candidates=CANDIDATES)
 
@@ -226,12 +242,10 @@ def vote():
         return jsonify({"success": False, "message": "Invalid candidate"})
     
     # Record the vote
-    voter_id = session.get('voter_id')
-    for voter in VOTERS_DB:
-        if voter['id'] == voter_id:
-            voter['has_voted'] = True
-            voter['vote'] = candidate
-            break
+    voter = VOTERS_DB.get(session.get('voter_id'))
+    if voter:
+        voter['has_voted'] = True
+        voter['vote'] = candidate
     
     # Add to voted users set
     VOTED_USERS.add(user_name)
@@ -251,9 +265,10 @@ def admin():
                          voting_active=voting_active,
                          results_published=results_published,
                          voters=VOTERS_DB,
-                         votes=VOTES,
+                         votes=VOTES.snapshot(),
                          notifications=list(NOTIFICATIONS),
-                         current_session=current_voting_session)
+                         current_session=current_voting_session,
+                         last_event_id=event_seq)
 
 @app.route('/admin/start_voting', methods=['POST'])
 def start_voting():
@@ -263,6 +278,7 @@ def start_voting():
     results_published = False
     
     add_notification("Voting started")
+    publish_state_change()
     return jsonify({"success": True, "message": "Voting started"})
 
 @app.route('/admin/stop_voting', methods=['POST'])
@@ -272,6 +288,7 @@ def stop_voting():
     voting_active = False
     
     add_notification("Voting stopped")
+    publish_state_change()
     return jsonify({"success": True, "message": "Voting stopped"})
 
 @app.route('/admin/publish_results', methods=['POST'])
@@ -285,10 +302,12 @@ def publish_results():
     results_published = True
     
     # Find winner
-    winner = max(VOTES.items(), key=lambda x: x[1]) if VOTES else None
+    votes_snapshot = VOTES.snapshot()
+    winner = max(votes_snapshot.items(), key=lambda x: x[1]) if votes_snapshot else None
     winner_msg = f"Winner: {winner[0]} with {winner[1]} votes" if winner and winner[1] > 0 else "No votes cast"
     
     add_notification(f"Results published - {winner_msg}")
+    publish_state_change()
     return jsonify({"success": True, "message": "Results published successfully"})
 
 @app.route('/admin/start_new_voting', methods=['POST'])
@@ -300,11 +319,12 @@ def start_new_voting():
         return jsonify({"success": False, "message": "Cannot start new voting while current session is active"})
     
     # Save current session to history if there were any votes
-    if sum(VOTES.values()) > 0 or results_published:
+    if VOTES.total() > 0 or results_published:
         save_current_session_to_history()
     
     # Reset for new session
     reset_current_session()
+    publish_state_change()
     
     return jsonify({"success": True, "message": f"New voting session {current_voting_session} started"})
 
@@ -320,34 +340,66 @@ def api_notifications():
     """API endpoint for live notifications"""
     return jsonify({"notifications": list(NOTIFICATIONS)})
 
+@app.route('/api/events')
+def api_events():
+    """Server-Sent Events stream of new notifications and state changes.
+
+    Clients resume from the Last-Event-ID header (sent automatically by
+    EventSource on reconnect) or the `since` query parameter. A client
+    that fell behind the retained events, or whose id is ahead of ours
+    because this app restarted, gets a single `resync` event.
+    """
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('since', 0))
+    except ValueError:
+        last_id = 0
+    
+    def stream():
+        nonlocal last_id
+        while True:
+            with event_cond:
+                if last_id <= event_seq:
+                    event_cond.wait_for(lambda: event_seq > last_id, timeout=SSE_KEEPALIVE_SECONDS)
+                if last_id > event_seq or (EVENTS and EVENTS[0]["id"] > last_id + 1):
+                    last_id = event_seq
+                    pending = [{"id": event_seq, "event": "resync", "data": current_status()}]
+                else:
+                    pending = [event for event in EVENTS if event["id"] > last_id]
+            
+            if not pending:
+                yield ": keepalive\n\n"
+                continue
+            for event in pending:
+                last_id = event["id"]
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/status')
 def api_status():
     """API endpoint for system status"""
-    return jsonify({
-        "voting_active": voting_active,
-        "results_published": results_published,
-        "total_votes": sum(VOTES.values()),
-        "voted_users": len(VOTED_USERS)
-    })
+    return jsonify(current_status())
 
 @app.route('/results')
 def results():
     """Show results page"""
     if not results_published:
-        return render_template('results_pending.html')
+        return render_template('results_pending.html', last_event_id=event_seq)
     
     # Calculate winner
+    votes_snapshot = VOTES.snapshot()
     winner = None
     max_votes = 0
-    for candidate, votes in VOTES.items():
+    for candidate, votes in votes_snapshot.items():
         if votes > max_votes:
             max_votes = votes
             winner = candidate
     
     return render_template('results.html', 
-                         votes=VOTES, 
+                         votes=votes_snapshot, 
                          winner=winner, 
-                         total_votes=sum(VOTES.values()))
+                         total_votes=sum(votes_snapshot.values()))
 
 if __name__ == '__main__':
     print("Flask Voting System starting...")
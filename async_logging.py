@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - Asynchronous Logging
+Queue-backed logging so log I/O never runs on a request thread
+"""
+
+import atexit
+import logging
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class BatchingStreamHandler(logging.StreamHandler):
+    """Stream handler that buffers formatted records and writes them in one call.
+
+    The buffer is written when it reaches batch_size records or when
+    flush() is called; the listener flushes whenever its queue runs dry,
+    so a lone record is still written immediately.
+    """
+
+    def __init__(self, stream=None, batch_size=256):
+        super().__init__(stream)
+        self.batch_size = batch_size
+        self._buffer = []
+
+    def emit(self, record):
+        try:
+            self._buffer.append(self.format(record) + self.terminator)
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._buffer and self.stream:
+                self.stream.write("".join(self._buffer))
+                self._buffer.clear()
+            super().flush()
+        finally:
+            self.release()
+
+
+class InProcessQueueHandler(QueueHandler):
+    """QueueHandler for a listener in the same process.
+
+    The stock prepare() formats the message and copies the record so it
+    can cross a process boundary; here the caller only merges the message
+    arguments, leaving formatting to the listener thread.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """Formatter that reuses the strftime result for records in the same second"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cached_second = None
+        self._cached_time = None
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt is not None:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        if second != self._cached_second:
+            self._cached_time = time.strftime(self.default_time_format, self.converter(record.created))
+            self._cached_second = second
+        return self.default_msec_format % (self._cached_time, record.msecs)
+
+
+class BatchingQueueListener(QueueListener):
+    """QueueListener that drains its queue in batches.
+
+    Whenever the queue runs dry the handlers are flushed and the listener
+    sleeps for flush_interval before waiting again, so under load it wakes
+    a few times a second to write a batch instead of once per record.
+    """
+
+    def __init__(self, log_queue, *handlers, flush_interval=0.05, **kwargs):
+        super().__init__(log_queue, *handlers, **kwargs)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                # As in logging.shutdown: the stream may already be closed at exit
+                try:
+                    handler.flush()
+                except (OSError, ValueError):
+                    pass
+            time.sleep(self.flush_interval)
+        return super().dequeue(block)
+
+    def stop(self):
+        # Safe to call again, e.g. explicitly and then from the atexit hook
+        if self._thread is not None:
+            super().stop()
+
+
+def configure_logging(level=logging.INFO, fmt=LOG_FORMAT, stream=None, batch_size=256):
+    """Route the root logger through a queue drained by a background listener.
+
+    Calling threads only merge the message arguments and enqueue the
+    record; timestamps are still taken when the record is created. Replaces any handlers already
+    on the root logger and returns the started listener, which is stopped
+    (and its buffer written out) at interpreter exit.
+    """
+    handler = BatchingStreamHandler(stream or sys.stderr, batch_size=batch_size)
+    handler.setFormatter(CachedTimeFormatter(fmt))
+
+    log_queue = queue.SimpleQueue()
+    listener = BatchingQueueListener(log_queue, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(InProcessQueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
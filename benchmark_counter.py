@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Stress test the live tally counter with many threads voting at once
+Casts --votes votes from --threads threads and checks every candidate's
+total is exact; exits non-zero if any count is off
+
+    python benchmark_counter.py --votes 1000000 --threads 32
+    python benchmark_counter.py --counter unlocked
+
+--counter locked and --counter unlocked run the same load against a plain
+dict behind one lock, and with no lock as app.py's VOTES used to be. Whether
+the unlocked dict loses updates depends on where the interpreter switches
+threads: CPython with the GIL rarely does, free-threaded builds can.
+"""
+
+import argparse
+import sys
+import threading
+import time
+
+from sharded_counter import ShardedCounter
+
+CANDIDATES = [f"Candidate {letter}" for letter in "ABCDEFGHIJ"]
+
+class UnlockedCounter:
+    """Plain dict counter with unlocked read-modify-write increments"""
+
+    def __init__(self, keys):
+        self.counts = {key: 0 for key in keys}
+
+    def increment(self, key, amount=1):
+        self.counts[key] += amount
+
+    def snapshot(self):
+        return dict(self.counts)
+
+class LockedCounter(UnlockedCounter):
+    """Plain dict counter behind one global lock"""
+
+    def __init__(self, keys):
+        super().__init__(keys)
+        self.lock = threading.Lock()
+
+    def increment(self, key, amount=1):
+        with self.lock:
+            self.counts[key] += amount
+
+def make_counter(kind, shards):
+    if kind == "sharded":
+        return ShardedCounter(CANDIDATES, shards=shards)
+    if kind == "locked":
+        return LockedCounter(CANDIDATES)
+    return UnlockedCounter(CANDIDATES)
+
+def expected_totals(votes, threads):
+    """Per-candidate totals when thread t casts its i-th vote for candidate (t + i) % n"""
+    totals = {candidate: 0 for candidate in CANDIDATES}
+    for thread_index in range(threads):
+        count = len(range(thread_index, votes, threads))
+        for i in range(count):
+            totals[CANDIDATES[(thread_index + i) % len(CANDIDATES)]] += 1
+    return totals
+
+def run(counter, votes, threads):
+    """Seconds taken to cast every vote with all threads released at once"""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(thread_index):
+        count = len(range(thread_index, votes, threads))
+        barrier.wait()
+        for i in range(count):
+            counter.increment(CANDIDATES[(thread_index + i) % len(CANDIDATES)])
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--votes", type=int, default=1000000)
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--counter", choices=["sharded", "locked", "unlocked"], default="sharded")
+    parser.add_argument("--switch-interval", type=float, default=1e-6,
+                        help="sys.setswitchinterval during the run, to force frequent thread switches")
+    args = parser.parse_args()
+
+    sys.setswitchinterval(args.switch_interval)
+    counter = make_counter(args.counter, args.shards)
+    elapsed = run(counter, args.votes, args.threads)
+    totals = counter.snapshot()
+    expected = expected_totals(args.votes, args.threads)
+
+    counted = sum(totals.values())
+    print(f"{args.counter}: {args.threads} threads cast {args.votes} votes in {elapsed:.2f}s "
+          f"({args.votes / elapsed:,.0f} votes/s); counted {counted}")
+    wrong = {candidate: (totals[candidate], expected[candidate])
+             for candidate in CANDIDATES if totals[candidate] != expected[candidate]}
+    for candidate, (actual, wanted) in wrong.items():
+        print(f"  {candidate}: counted {actual}, expected {wanted}")
+    sys.exit(1 if wrong else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark vote throughput with synchronous, asynchronous or no logging
+Runs a primary and two replicas in this process and casts votes over XML-RPC
+
+    python benchmark_logging.py --logging sync  2>votes.log
+    python benchmark_logging.py --logging async 2>votes.log
+    python benchmark_logging.py --logging off
+
+--write-delay-ms makes every write to the log stream sleep first, standing
+in for a slow terminal, disk or log shipper.
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+from async_logging import LOG_FORMAT, configure_logging
+from local_cluster import free_port, wait_for_replicas
+from replica import ReplicaServer, ThreadedXMLRPCServer
+from rpc_transport import KeepAliveRequestHandler, ServerProxyPool
+from server import VotingServer, create_rpc_server
+
+class SlowStream:
+    """Text stream wrapper that sleeps before every write"""
+
+    def __init__(self, stream, delay):
+        self.stream = stream
+        self.delay = delay
+
+    def write(self, text):
+        time.sleep(self.delay)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+def setup_logging(mode, write_delay):
+    """Configure the root logger for one benchmark mode"""
+    stream = SlowStream(sys.stderr, write_delay) if write_delay else sys.stderr
+    if mode == "sync":
+        logging.basicConfig(level=logging.INFO, format=LOG_FORMAT, stream=stream, force=True)
+    elif mode == "async":
+        configure_logging(logging.INFO, stream=stream)
+    else:
+        logging.getLogger().setLevel(logging.WARNING)
+
+def start_cluster():
+    """Start two replicas and a primary on free ports; returns (primary, primary_url)"""
+    primary_port = free_port()
+    replica_ports = [free_port(), free_port()]
+
+    replicas = []
+    for port in replica_ports:
+        replica = ReplicaServer(port, primary_url=f"http://localhost:{primary_port}")
+        replicas.append(replica)
+        rpc_server = ThreadedXMLRPCServer(("localhost", port), requestHandler=KeepAliveRequestHandler,
+                                          allow_none=True)
+        rpc_server.register_instance(replica)
+        threading.Thread(target=rpc_server.serve_forever, daemon=True).start()
+
+    primary = VotingServer(port=primary_port, replica_ports=replica_ports, max_concurrent_votes=8)
+    rpc_server = create_rpc_server("localhost", primary_port, "threaded", 16)
+    rpc_server.register_instance(primary)
+    threading.Thread(target=rpc_server.serve_forever, daemon=True).start()
+    wait_for_replicas(replicas, primary)
+    return primary, f"http://localhost:{primary_port}"
+
+def run(votes, clients):
+    primary, url = start_cluster()
+    sessions = []
+    for i in range(votes):
+        registered = primary.Register(f"bench{i}")
+        sessions.append(primary.Login(f"bench{i}", registered["id"])["session_id"])
+    primary.StartVote()
+    time.sleep(0.5)
+
+    pool = ServerProxyPool(url, size=clients)
+    candidate = primary.candidates[0]
+
+    def cast(chunk):
+        for session_id in chunk:
+            with pool.connection() as proxy:
+                proxy.Vote(session_id, candidate, time.time(), time.time())
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=cast, args=(sessions[k::clients],)) for k in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Votes are queued; wait until every one has been replicated and committed or dropped
+    while True:
+        status = primary.GetQueueStatus()
+        if not (status["queued"] or status["active"]):
+            break
+        time.sleep(0.001)
+    return time.perf_counter() - start, sum(primary.tally.values())
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logging", choices=["sync", "async", "off"], default="async")
+    parser.add_argument("--votes", type=int, default=3000)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--write-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    setup_logging(args.logging, args.write_delay_ms / 1000)
+    elapsed, committed = run(args.votes, args.clients)
+    print(f"logging={args.logging}: {committed}/{args.votes} votes committed in {elapsed:.3f}s "
+          f"({committed / elapsed:.0f} votes/s)", flush=True)
+    # Skip joining the serving threads and draining a possibly slow log sink
+    os._exit(0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Benchmark primary recovery time from a write-ahead log of recorded votes
+Builds a WAL in which every one of --votes registered voters has voted, then
+times VotingServer startup from it: from a snapshot covering all but the last
+--tail operations, and (unless --skip-full-replay) by replaying the whole log
+
+    python benchmark_recovery.py --votes 10000000 --tail 100000
+"""
+
+import argparse
+import logging
+import shutil
+import tempfile
+import time
+
+from server import VotingServer
+from voter_store import default_voters
+from wal import WriteAheadLog
+
+CANDIDATES = [f"Candidate {letter}" for letter in "ABCDEFGHIJ"]
+
+def operations(votes):
+    """(op, data) pairs registering voter i and then recording their vote"""
+    first_id = len(default_voters()) + 1
+    for i in range(votes):
+        voter_id = first_id + i
+        yield "register", {"id": voter_id, "name": f"voter{voter_id}", "has_voted": False, "vote": None}
+        yield "vote", {"voter_id": voter_id, "candidate": CANDIDATES[i % len(CANDIDATES)]}
+
+def state_after(votes, seq):
+    """Primary snapshot state once the first seq operations have been applied"""
+    voters = default_voters()
+    tally = {candidate: 0 for candidate in CANDIDATES}
+    first_id = len(voters) + 1
+    for i in range(min(votes, (seq + 1) // 2)):
+        voted = 2 * i + 2 <= seq
+        candidate = CANDIDATES[i % len(CANDIDATES)]
+        voters.append({"id": first_id + i, "name": f"voter{first_id + i}",
+                       "has_voted": voted, "vote": candidate if voted else None})
+        if voted:
+            tally[candidate] += 1
+    return {"voters": voters, "voting_active": True, "voting_deadline": None,
+            "results_published": False, "tally": tally}
+
+def build_wal(directory, votes, snapshot_tail=None):
+    """Write the log; with snapshot_tail, snapshot everything but that many trailing operations"""
+    wal = WriteAheadLog(directory, fsync_policy="group", snapshot_every=0)
+    total = 2 * votes
+    snapshot_at = None if snapshot_tail is None else max(0, total - snapshot_tail)
+    for seq, (op, data) in enumerate(operations(votes), start=1):
+        wal.append(op, data)
+        if seq == snapshot_at:
+            wal.write_snapshot(wal.begin_snapshot(), state_after(votes, seq))
+    wal.close()
+
+def time_recovery(directory, votes):
+    """Seconds to construct a primary from the log, checked against the expected tally"""
+    start = time.perf_counter()
+    server = VotingServer(port=0, replica_ports=[], data_dir=directory, snapshot_every=0)
+    elapsed = time.perf_counter() - start
+    recorded = sum(server.tally.values())
+    assert recorded == votes, f"recovered {recorded} votes, expected {votes}"
+    server.wal.close()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--votes", type=int, default=10000000)
+    parser.add_argument("--tail", type=int, default=100000,
+                        help="Operations logged after the snapshot (default: 100000)")
+    parser.add_argument("--skip-full-replay", action="store_true")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    modes = [("snapshot + tail", args.tail)]
+    if not args.skip_full_replay:
+        modes.append(("full replay", None))
+    for label, tail in modes:
+        directory = tempfile.mkdtemp(prefix="wal-bench-")
+        try:
+            start = time.perf_counter()
+            build_wal(directory, args.votes, tail)
+            print(f"{label}: wrote {2 * args.votes} operations in {time.perf_counter() - start:.1f}s", flush=True)
+            elapsed = time_recovery(directory, args.votes)
+            print(f"{label}: recovered {args.votes} votes in {elapsed:.2f}s", flush=True)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Load test the primary's RPC front end across serving modes and worker counts
+Runs a primary and two replicas in this process; --clients client processes
+each loop Register + Login + Vote over XML-RPC for --seconds per configuration
+
+    python benchmark_rpc.py --workers 1,2,4,8,16 --replica-delay-ms 20
+
+--replica-delay-ms makes every replication call sleep first, standing in for
+the network round trip to real replicas, which is what a single in-flight
+request would otherwise serialize every caller behind.
+"""
+
+import argparse
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+import xmlrpc.client
+
+from local_cluster import free_port, wait_for_replicas
+from replica import ReplicaServer, ThreadedXMLRPCServer
+from rpc_transport import KeepAliveRequestHandler
+from server import VotingServer, create_rpc_server
+
+class DelayedReplica(ReplicaServer):
+    """Replica that sleeps before handling every replication call"""
+
+    delay = 0.0
+
+    def ReplicateUpdate(self, *args):
+        time.sleep(self.delay)
+        return super().ReplicateUpdate(*args)
+
+    def ReplicateBatch(self, *args):
+        time.sleep(self.delay)
+        return super().ReplicateBatch(*args)
+
+def start_replicas(primary_port, ports):
+    """Start a replica on each port, following the primary on primary_port"""
+    replicas = []
+    for port in ports:
+        replica = DelayedReplica(port, primary_url=f"http://localhost:{primary_port}")
+        rpc_server = ThreadedXMLRPCServer(("localhost", port), requestHandler=KeepAliveRequestHandler,
+                                          allow_none=True, logRequests=False)
+        rpc_server.register_instance(replica)
+        threading.Thread(target=rpc_server.serve_forever, daemon=True).start()
+        replicas.append(replica)
+    return replicas
+
+def client(url, prefix, candidate, seconds, results):
+    """Client process: loop Register + Login + Vote until seconds pass, then report the count"""
+    proxy = xmlrpc.client.ServerProxy(url, allow_none=True)
+    completed = 0
+    deadline = time.perf_counter() + seconds
+    for i in itertools.count():
+        if time.perf_counter() >= deadline:
+            break
+        name = f"{prefix}-{i}"
+        voter_id = proxy.Register(name)["id"]
+        session_id = proxy.Login(name, voter_id)["session_id"]
+        proxy.Vote(session_id, candidate)
+        completed += 1
+    results.put(completed)
+
+def run(mode, workers, clients, seconds):
+    """Completed Register + Login + Vote rounds per second for one configuration"""
+    port = free_port()
+    replica_ports = [free_port(), free_port()]
+    primary = VotingServer(port=port, replica_ports=replica_ports)
+    rpc_server = create_rpc_server("localhost", port, mode, workers)
+    rpc_server.register_instance(primary)
+    threading.Thread(target=rpc_server.serve_forever, daemon=True).start()
+    wait_for_replicas(start_replicas(port, replica_ports), primary)
+    primary.StartVote()
+
+    # Clients run in their own processes so they do not compete with the
+    # server for this interpreter's GIL
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(target=client, args=(f"http://localhost:{port}", f"load{k}",
+                                             primary.candidates[0], seconds, results))
+        for k in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    rounds = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    rpc_server.shutdown()
+    rpc_server.server_close()
+    return rounds / seconds
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4,8,16",
+                        help="Comma-separated worker counts for threaded mode")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--replica-delay-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    DelayedReplica.delay = args.replica_delay_ms / 1000
+    configurations = [("single", 1)] + [("threaded", int(workers)) for workers in args.workers.split(",")]
+    for mode, workers in configurations:
+        rate = run(mode, workers, args.clients, args.seconds)
+        print(f"{mode:>8} {workers:3d} worker(s): {rate:,.0f} rounds/s "
+              f"({3 * rate:,.0f} RPCs/s)", flush=True)
+
+if __name__ == "__main__":
+    main()
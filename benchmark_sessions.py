@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark the session store holding millions of live sessions
+Measures login rate, lookup latency, memory and the cost of mass expiry,
+then lock contention with many threads logging in and looking up at once
+
+    python benchmark_sessions.py --sessions 5000000
+    python benchmark_sessions.py --sessions 0 --threads 64
+"""
+
+import argparse
+import random
+import resource
+import threading
+import time
+
+from session_store import SessionStore
+
+def rss_mb():
+    """Peak resident set size of this process in MB"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_contention(shards, threads, ops_per_thread):
+    """Ops/s with every thread doing a login+logout pair for every 9 lookups"""
+    store = SessionStore(ttl=86400.0, shards=shards)
+    seed_tokens = [store.create(i, f"voter{i}") for i in range(10000)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        barrier.wait()
+        for i in range(ops_per_thread):
+            if i % 10 == 0:
+                store.remove(store.create(index, "bench"))
+            else:
+                store.get(seed_tokens[rng.randrange(len(seed_tokens))])
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return threads * ops_per_thread / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5000000)
+    parser.add_argument("--lookups", type=int, default=1000000)
+    parser.add_argument("--threads", type=int, default=64)
+    parser.add_argument("--ops-per-thread", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.threads:
+        for shards in (1, 16, 64):
+            rate = run_contention(shards, args.threads, args.ops_per_thread)
+            print(f"{args.threads} threads, {shards:2d} shard(s): {rate:,.0f} ops/s")
+    if not args.sessions:
+        return
+
+    # A TTL far in the future keeps the background reaper idle during the run
+    store = SessionStore(ttl=86400.0)
+    names = [f"voter{i}" for i in range(1000)]
+    baseline = rss_mb()
+
+    start = time.perf_counter()
+    tokens = [store.create(i, names[i % len(names)]) for i in range(args.sessions)]
+    elapsed = time.perf_counter() - start
+    print(f"Created {args.sessions} sessions in {elapsed:.2f}s ({args.sessions / elapsed:,.0f}/s)")
+
+    stats = store.stats()
+    # The benchmark's own token list is not part of the store
+    held_mb = rss_mb() - baseline
+    print(f"Accounted memory: {stats['approx_bytes'] / 2**20:,.0f} MB "
+          f"({stats['approx_bytes'] / args.sessions:.0f} B/session); "
+          f"RSS growth incl. benchmark token list: {held_mb:,.0f} MB")
+
+    sample = random.sample(tokens, min(args.lookups, len(tokens)))
+    start = time.perf_counter()
+    for token in sample:
+        store.get(token)
+    elapsed = time.perf_counter() - start
+    print(f"{len(sample)} lookups: {elapsed / len(sample) * 1e6:.2f} us each")
+
+    start = time.perf_counter()
+    for token in sample[:10000]:
+        store.remove(token)
+    elapsed = time.perf_counter() - start
+    print(f"10000 logouts: {elapsed / 10000 * 1e6:.2f} us each")
+
+    start = time.perf_counter()
+    removed = store.expire(now=time.time() + 2 * store.ttl)
+    elapsed = time.perf_counter() - start
+    print(f"Expired {removed} sessions in {elapsed:.2f}s; {len(store)} left, "
+          f"{store.stats()['heap_entries']} heap entries")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark Login and Vote latency as the electorate grows
+For each size, loads that many voters into a primary with no replicas, then
+times Login and a blocking Vote for randomly chosen voters; with the indexed
+voter store both should stay flat from 10 to 10M voters
+
+    python benchmark_voters.py --sizes 10,1000,100000,1000000,10000000
+"""
+
+import argparse
+import logging
+import random
+import time
+
+from server import VotingServer
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def load_voters(server, count):
+    """Add count voters straight into the store; returns their (id, name) pairs"""
+    voters = []
+    for _ in range(count):
+        voter_id = server.voters_db.allocate_id()
+        name = f"voter{voter_id}"
+        server.voters_db.add({"id": voter_id, "name": name, "has_voted": False, "vote": None})
+        voters.append((voter_id, name))
+    return voters
+
+def measure(size, samples):
+    """(login_us, vote_us) latency samples for one electorate size"""
+    server = VotingServer(port=0, replica_ports=[])
+    voters = load_voters(server, size)
+    server.StartVote()
+    chosen = random.sample(voters, min(samples, len(voters)))
+
+    login_us = []
+    sessions = []
+    for voter_id, name in chosen:
+        start = time.perf_counter()
+        result = server.Login(name, voter_id)
+        login_us.append((time.perf_counter() - start) * 1e6)
+        sessions.append(result["session_id"])
+
+    vote_us = []
+    for session_id in sessions:
+        start = time.perf_counter()
+        result = server.Vote(session_id, server.candidates[0], wait=True)
+        vote_us.append((time.perf_counter() - start) * 1e6)
+        assert result["success"], result["message"]
+    return login_us, vote_us
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,100000,1000000,10000000",
+                        help="Comma-separated electorate sizes")
+    parser.add_argument("--samples", type=int, default=2000,
+                        help="Logins and votes timed per size (default: 2000)")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{'voters':>10} {'login p50':>10} {'login p99':>10} {'vote p50':>10} {'vote p99':>10}  (us)")
+    for size in (int(value) for value in args.sizes.split(",")):
+        login_us, vote_us = measure(size, args.samples)
+        print(f"{size:>10} {percentile(login_us, 0.5):>10.1f} {percentile(login_us, 0.99):>10.1f} "
+              f"{percentile(vote_us, 0.5):>10.1f} {percentile(vote_us, 0.99):>10.1f}", flush=True)
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,11 @@ Web interface for voters to login, view candidates, and cast votes
 import time
 import threading
 from flask import Flask, render_template_string, request, jsonify, session, redirect, url_for
-from xmlrpc.client import ServerProxy
 import logging
 from datetime import datetime
 
+from rpc_transport import ServerProxyPool
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -20,56 +21,48 @@ app.secret_key = 'voting_system_secret_key_2024'
 
 # Server connections
 VOTING_SERVER_URL = "http://localhost:8000"
+# Shared by every request thread; connections are reused across requests
+VOTING_SERVER_POOL = ServerProxyPool(VOTING_SERVER_URL, size=8, timeout=10, max_idle=30)
+# How long a vote submission waits for the committed outcome; under the pool timeout
+VOTE_WAIT_SECONDS = 5
 
 
 def get_server_connection():
-    """Get connection to voting server"""
-    try:
-        return ServerProxy(VOTING_SERVER_URL)
-    except Exception as e:
-        logger.error(f"Failed to connect to voting server: {e}")
-        return None
+    """Check out a pooled keep-alive connection to the voting server"""
+    return VOTING_SERVER_POOL.connection()
 
 
 
 @app.route('/')
 def dashboard():
     """Main dashboard"""
-    server = get_server_connection()
-
-    
     candidates = []
     voting_status = None
     results = None
     user_has_voted = False
     deadline_str = None
     
-    if server:
-        try:
-            # Get candidates
-            candidates_response = server.GetOptions()
-            if candidates_response.get('success'):
-                candidates = candidates_response['candidates']
-            
-            # Get voting status
-            voting_status = server.GetVotingStatus()
+    try:
+        # Candidates, voting status and this voter's status in one round trip
+        with get_server_connection() as server:
+            dashboard_response = server.GetDashboard(session.get('session_id'))
+        
+        if dashboard_response.get('success'):
+            candidates = dashboard_response['candidates']
+            voting_status = dashboard_response['status']
             
             # Check if user has voted
-            if session.get('logged_in'):
-                db_response = server.GetVoterDatabase()
-                if db_response.get('success'):
-                    for voter in db_response['voters']:
-                        if (voter['id'] == session.get('voter_id') and 
-                            voter['name'] == session.get('name')):
-                            user_has_voted = voter['has_voted']
-                            break
-            
-            # Format deadline
-            if voting_status and voting_status.get('deadline'):
-                deadline_str = datetime.fromtimestamp(voting_status['deadline']).strftime('%Y-%m-%d %H:%M:%S')
+            voter = dashboard_response.get('voter')
+            if (session.get('logged_in') and voter and
+                voter['name'] == session.get('name')):
+                user_has_voted = voter['has_voted']
         
-        except Exception as e:
-            logger.error(f"Error getting server data: {e}")
+        # Format deadline
+        if voting_status and voting_status.get('deadline'):
+            deadline_str = datetime.fromtimestamp(voting_status['deadline']).strftime('%Y-%m-%d %H:%M:%S')
+    
+    except Exception as e:
+        logger.error(f"Error getting server data: {e}")
     
     
 
@@ -84,14 +77,9 @@ def register():
         session['message_type'] = "error"
         return redirect(url_for('dashboard'))
     
-    server = get_server_connection()
-    if not server:
-        session['message'] = "Cannot connect to voting server"
-        session['message_type'] = "error"
-        return redirect(url_for('dashboard'))
-    
     try:
-        result = server.Register(name)
+        with get_server_connection() as server:
+            result = server.Register(name)
         if result.get('success'):
             session['message'] = f"Registration successful! Your ID is: {result['id']}"
             session['message_type'] = "success"
@@ -122,14 +110,9 @@ def login():
         session['message_type'] = "error"
         return redirect(url_for('dashboard'))
     
-    server = get_server_connection()
-    if not server:
-        session['message'] = "Cannot connect to voting server"
-        session['message_type'] = "error"
-        return redirect(url_for('dashboard'))
-    
     try:
-        result = server.Login(name, voter_id)
+        with get_server_connection() as server:
+            result = server.Login(name, voter_id)
         if result.get('success'):
             session['logged_in'] = True
             session['name'] = name
@@ -149,7 +132,14 @@ def login():
 @app.route('/logout', methods=['POST'])
 def logout():
     """Logout voter"""
+    session_id = session.get('session_id')
     session.clear()
+    if session_id:
+        try:
+            with get_server_connection() as server:
+                server.Logout(session_id)
+        except Exception as e:
+            logger.error(f"Logout error: {e}")
     return jsonify({"success": True})
 
 @app.route('/vote', methods=['POST'])
@@ -165,25 +155,18 @@ def vote():
     if not candidate or not click_time:
         return jsonify({"success": False, "message": "Missing candidate or click time"})
     
-    server = get_server_connection()
-    if not server:
-        return jsonify({"success": False, "message": "Cannot connect to voting server"})
-    
     try:
-        # Get server time for timestamp
-        time_response = server.GetServerTime()
-        if not time_response.get('success'):
-            return jsonify({"success": False, "message": "Failed to get server time"})
-        
-        timestamp = time_response['lamport_clock']
-        
-        # Submit vote
-        result = server.Vote(
-            session['session_id'],
-            candidate,
-            timestamp,
-            click_time
-        )
+        # Submit vote; the server stamps it with its hybrid logical clock and
+        # answers with the committed outcome, or with a ticket if it takes longer
+        with get_server_connection() as server:
+            result = server.Vote(
+                session['session_id'],
+                candidate,
+                None,
+                click_time,
+                True,
+                VOTE_WAIT_SECONDS
+            )
         
         return jsonify(result)
         
@@ -194,12 +177,9 @@ def vote():
 @app.route('/api/status')
 def api_status():
     """API endpoint for status"""
-    server = get_server_connection()
-    if not server:
-        return jsonify({"success": False, "message": "Cannot connect to voting server"})
-    
     try:
-        return jsonify(server.GetVotingStatus())
+        with get_server_connection() as server:
+            return jsonify(server.GetVotingStatus())
     except Exception as e:
         return jsonify({"success": False, "message": f"Error: {e}"})
 
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - Hybrid Logical Clock
+Monotonic timestamps that track wall time and respect causality across servers
+"""
+
+import threading
+import time
+
+# Low bits of a timestamp count events within the same wall-clock millisecond
+LOGICAL_BITS = 16
+
+# Furthest ahead of the local wall clock, in seconds, that update() accepts a remote stamp
+MAX_OFFSET = 1.0
+
+
+def encode(timestamp):
+    """Wire form of a timestamp; packed values exceed XML-RPC's 32-bit int range"""
+    return str(timestamp)
+
+
+def decode(value):
+    """Inverse of encode; also accepts plain numbers and None (returned as 0)"""
+    if value is None:
+        return 0
+    return int(value)
+
+
+class HybridLogicalClock:
+    """Hybrid logical clock packed into one int: wall-clock ms << 16 | logical counter.
+
+    tick() stamps a local state change and update() folds in a timestamp
+    received from another server; both return a value greater than every
+    timestamp this clock has issued or seen, and equal to the wall clock
+    whenever the wall clock is ahead. Values therefore order causally
+    related events correctly and read as approximate wall time.
+
+    update() refuses stamps more than max_offset seconds ahead of the
+    wall clock (None disables the bound), so one bad stamp cannot drag
+    every later value away from wall time.
+
+    Only tick() and update() lock, and only for a compare and an
+    assignment. `last` is a single int attribute that only ever grows, so
+    readers take it without locking.
+    """
+
+    def __init__(self, wall=time.time, max_offset=MAX_OFFSET):
+        self._wall = wall
+        self._max_offset = None if max_offset is None else int(max_offset * 1000) << LOGICAL_BITS
+        self._lock = threading.Lock()
+        self.last = 0
+
+    def _wall_timestamp(self):
+        return int(self._wall() * 1000) << LOGICAL_BITS
+
+    def tick(self):
+        """Timestamp for a local state-changing event"""
+        wall = self._wall_timestamp()
+        with self._lock:
+            self.last = max(wall, self.last + 1)
+            return self.last
+
+    def update(self, remote):
+        """Timestamp for receiving an event stamped remote elsewhere.
+
+        Raises ValueError if remote is more than max_offset ahead of the wall clock.
+        """
+        wall = self._wall_timestamp()
+        if self._max_offset is not None and remote > wall + self._max_offset:
+            raise ValueError(f"timestamp {remote} is more than the maximum offset ahead of the clock")
+        with self._lock:
+            self.last = max(wall, self.last + 1, remote + 1)
+            return self.last
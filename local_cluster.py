@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - Local Cluster
+Helpers for primaries and replicas started in-process by benchmarks and tests
+"""
+
+import socket
+import time
+
+
+def free_port():
+    """A localhost port that was free when probed"""
+    with socket.socket() as probe:
+        probe.bind(("localhost", 0))
+        return probe.getsockname()[1]
+
+
+def wait_for_replicas(replicas, primary):
+    """Block until every replica has caught up onto the primary's epoch and acks its writes"""
+    for replica in replicas:
+        replica.catchup_requested.set()
+    while any(replica.epoch != primary.replication_epoch or replica.needs_resync for replica in replicas):
+        time.sleep(0.05)
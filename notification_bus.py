@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - Notification Bus
+Non-blocking publish with fan-out to bounded per-subscriber queues
+"""
+
+import itertools
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """One subscriber's bounded ring of undelivered notifications.
+
+    When the ring is full the oldest entry is dropped to make room and
+    counted in `dropped`, so a slow reader loses history rather than
+    holding up anyone else. Guarded by the owning bus's lock.
+    """
+
+    def __init__(self, subscriber_id, name, capacity):
+        self.subscriber_id = subscriber_id
+        self.name = name
+        self.ring = deque(maxlen=capacity)
+        self.delivered = 0
+        self.dropped = 0
+        self.dropped_reported = 0
+        self.last_seq = 0
+        self.last_poll = time.time()
+
+    def offer(self, notification):
+        if len(self.ring) == self.ring.maxlen:
+            self.dropped += 1
+        self.ring.append(notification)
+
+    def metrics(self, published_seq):
+        return {
+            "subscriber_id": self.subscriber_id,
+            "name": self.name,
+            "queued": len(self.ring),
+            "capacity": self.ring.maxlen,
+            "lag": published_seq - self.last_seq,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "idle_seconds": round(time.time() - self.last_poll, 3),
+        }
+
+
+class NotificationBus:
+    """Publish/subscribe channel for activity notifications.
+
+    publish() only records the wall-clock time and puts the message on an
+    unbounded inbound queue; it takes no lock the readers hold. A single
+    dispatcher thread assigns sequence numbers, formats timestamps, logs,
+    appends to the shared history and fans out to every subscription.
+
+    Readers either page through the shared history with a cursor
+    (read_since) or subscribe and drain their own ring (poll). Subscriptions
+    not polled for idle_timeout seconds are dropped.
+    """
+
+    def __init__(self, history=100, subscriber_capacity=256, idle_timeout=300.0, max_wait=30.0):
+        self.history = deque(maxlen=history)
+        self.subscriber_capacity = subscriber_capacity
+        self.idle_timeout = idle_timeout
+        self.max_wait = max_wait
+
+        self._inbound = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._subscriptions = {}
+        self._subscriber_ids = itertools.count(1)
+        self.published_seq = 0
+
+        dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        dispatcher.start()
+
+    # Publishing
+
+    def publish(self, message):
+        """Queue a notification for delivery; never blocks"""
+        self._inbound.put((time.time(), message))
+
+    def _dispatch(self):
+        last_sweep = time.time()
+        while True:
+            try:
+                batch = [self._inbound.get(timeout=1.0)]
+            except queue.Empty:
+                batch = []
+            # Drain whatever else is waiting so a burst costs one wake-up
+            while True:
+                try:
+                    batch.append(self._inbound.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self._deliver(batch)
+                if time.time() - last_sweep >= self.idle_timeout / 10:
+                    self._expire_idle()
+                    last_sweep = time.time()
+            except Exception as e:
+                logger.error(f"Error dispatching notifications: {e}")
+
+    def _deliver(self, batch):
+        if not batch:
+            return
+        notifications = []
+        for published_at, message in batch:
+            timestamp = datetime.fromtimestamp(published_at).isoformat()
+            notifications.append({"timestamp": timestamp, "message": message})
+            logger.info(f"Notification: {message}")
+
+        with self._cond:
+            for notification in notifications:
+                self.published_seq += 1
+                notification["seq"] = self.published_seq
+                self.history.append(notification)
+                for subscription in self._subscriptions.values():
+                    subscription.offer(notification)
+            self._cond.notify_all()
+
+    def _expire_idle(self):
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            for subscriber_id, subscription in list(self._subscriptions.items()):
+                if subscription.last_poll < cutoff:
+                    del self._subscriptions[subscriber_id]
+                    logger.info(f"Dropped idle notification subscriber {subscriber_id}")
+
+    # Cursor reads over the shared history
+
+    def read_since(self, since_seq=None, max_items=100, timeout=0):
+        """Notifications with seq > since_seq from the shared history.
+
+        Returns (notifications, next_seq, missed). Without since_seq every
+        retained notification is returned. A positive timeout waits, up to
+        max_wait, for something new. `missed` is true when entries after
+        since_seq were evicted before being read, or when since_seq is ahead
+        of published_seq because the server restarted; the latter restarts
+        the cursor from the oldest retained notification without waiting.
+        """
+        with self._cond:
+            if since_seq is None:
+                return list(self.history), self.published_seq, False
+
+            if since_seq > self.published_seq:
+                delta = list(itertools.islice(self.history, max(0, max_items)))
+                return delta, delta[-1]["seq"] if delta else self.published_seq, True
+
+            if timeout and self.published_seq <= since_seq:
+                self._cond.wait_for(lambda: self.published_seq > since_seq,
+                                    timeout=min(timeout, self.max_wait))
+
+            # Seqs in the history are contiguous, so the delta starts at a known offset
+            oldest_seq = self.history[0]["seq"] if self.history else self.published_seq + 1
+            start = max(0, since_seq + 1 - oldest_seq)
+            delta = list(itertools.islice(self.history, start, start + max(0, max_items)))
+            next_seq = delta[-1]["seq"] if delta else max(since_seq, oldest_seq - 1)
+            return delta, next_seq, since_seq + 1 < oldest_seq
+
+    # Subscriptions
+
+    def subscribe(self, name=None, capacity=None):
+        """Register a subscriber and return its id.
+
+        Only notifications dispatched after subscribing are delivered.
+        """
+        subscriber_id = next(self._subscriber_ids)
+        subscription = Subscription(subscriber_id, name or f"subscriber-{subscriber_id}",
+                                    capacity or self.subscriber_capacity)
+        with self._lock:
+            subscription.last_seq = self.published_seq
+            self._subscriptions[subscriber_id] = subscription
+        return subscriber_id
+
+    def unsubscribe(self, subscriber_id):
+        """Remove a subscriber; returns False if it was unknown or expired"""
+        with self._lock:
+            return self._subscriptions.pop(subscriber_id, None) is not None
+
+    def poll(self, subscriber_id, max_items=100, timeout=0):
+        """Take up to max_items queued notifications for a subscriber.
+
+        Returns (notifications, dropped) where dropped counts entries lost to
+        overflow since the previous poll, or None if the subscriber is unknown.
+        A positive timeout waits, up to max_wait, while the ring is empty.
+        """
+        with self._cond:
+            subscription = self._subscriptions.get(subscriber_id)
+            if subscription is None:
+                return None
+            subscription.last_poll = time.time()
+            if timeout and not subscription.ring:
+                self._cond.wait_for(lambda: subscription.ring or subscriber_id not in self._subscriptions,
+                                    timeout=min(timeout, self.max_wait))
+
+            count = min(len(subscription.ring), max(0, max_items))
+            notifications = [subscription.ring.popleft() for _ in range(count)]
+            if notifications:
+                subscription.last_seq = notifications[-1]["seq"]
+            elif not subscription.ring:
+                subscription.last_seq = self.published_seq
+            subscription.delivered += len(notifications)
+            dropped = subscription.dropped - subscription.dropped_reported
+            subscription.dropped_reported = subscription.dropped
+            subscription.last_poll = time.time()
+            return notifications, dropped
+
+    # Metrics
+
+    def metrics(self):
+        """Bus-wide counters plus per-subscriber lag (published seq minus last delivered) and drops"""
+        with self._lock:
+            subscribers = [s.metrics(self.published_seq) for s in self._subscriptions.values()]
+            return {
+                "published": self.published_seq,
+                "pending_dispatch": self._inbound.qsize(),
+                "subscribers": subscribers,
+                "total_dropped": sum(s["dropped"] for s in subscribers),
+            }
@@ -7,31 +7,36 @@ Maintains synchronized copy of the main server's data
 import threading
 import time
 import sys
+from socketserver import ThreadingMixIn
 from xmlrpc.server import SimpleXMLRPCServer
 from datetime import datetime
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from async_logging import configure_logging
+from hybrid_clock import HybridLogicalClock, decode, encode
+from rpc_transport import KeepAliveRequestHandler, ServerProxyPool
+from voter_store import VoterStore, default_voters, voter_query_args
+from wal import WriteAheadLog
+
 logger = logging.getLogger(__name__)
 
+REPLICATED_OPERATIONS = {"vote", "register", "set_timer", "start_vote", "stop_vote", "publish_results", "noop"}
+
+class ThreadedXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
+    """XML-RPC server with one thread per connection.
+
+    The primary holds keep-alive connections open, so a single-threaded
+    server would be pinned to whichever connection it accepted first.
+    """
+    daemon_threads = True
+
 class ReplicaServer:
-    def __init__(self, port):
+    def __init__(self, port, data_dir=None, fsync_policy="group", snapshot_every=10000,
+                 primary_url="http://localhost:8000", catchup_interval=2.0, catchup_batch=1000):
         self.port = port
         
         # Replica of voter database
-        self.voters_db = [
-            {"id": 1, "name": "Alice", "has_voted": False, "vote": None},
-            {"id": 2, "name": "Bob", "has_voted": False, "vote": None},
-            {"id": 3, "name": "Charlie", "has_voted": False, "vote": None},
-            {"id": 4, "name": "Diana", "has_voted": False, "vote": None},
-            {"id": 5, "name": "Eve", "has_voted": False, "vote": None},
-            {"id": 6, "name": "Frank", "has_voted": False, "vote": None},
-            {"id": 7, "name": "Grace", "has_voted": False, "vote": None},
-            {"id": 8, "name": "Henry", "has_voted": False, "vote": None},
-            {"id": 9, "name": "Ivy", "has_voted": False, "vote": None},
-            {"id": 10, "name": "Jack", "has_voted": False, "vote": None}
-        ]
+        self.voters_db = VoterStore(default_voters())
         
         # Replica state
         self.voting_active = False
@@ -41,74 +46,416 @@ class ReplicaServer:
         # Thread safety
         self.db_lock = threading.Lock()
         
+        # Replication position: every operation up to applied_seq of the primary's
+        # epoch is applied. Pushed operations wait in staged (seq -> (operation,
+        # data, clock)) until settled (seq -> committed) holds the primary's
+        # decision, and are applied strictly in seq order
+        self.epoch = None
+        self.applied_seq = 0
+        self.staged = {}
+        self.settled = {}
+        self.needs_resync = True
+        
+        # Hybrid logical clock merged with the primary's stamp on every applied
+        # operation; applied_clock is the newest stamp applied so far. The primary
+        # is followed however far its clock runs ahead of ours, so it is unbounded
+        self.clock = HybridLogicalClock(max_offset=None)
+        self.applied_clock = 0
+        
+        # Durable write-ahead log of applied operations (in-memory only without a data_dir)
+        self.wal = None
+        self.snapshot_in_progress = False
+        if data_dir:
+            self.wal = WriteAheadLog(data_dir, fsync_policy=fsync_policy, snapshot_every=snapshot_every)
+            self._recover_from_wal()
+        
+        # Catch-up from the primary's replication log
+        self.primary = ServerProxyPool(primary_url, size=1, timeout=10) if primary_url else None
+        self.catchup_interval = catchup_interval
+        self.catchup_batch = catchup_batch
+        self.primary_reachable = True
+        self.catchup_requested = threading.Event()
+        if self.primary is not None:
+            catchup_thread = threading.Thread(target=self._catch_up_periodically, daemon=True)
+            catchup_thread.start()
+        
         logger.info(f"Replica server initialized on port {port}")
     
-    def ReplicateUpdate(self, operation, data):
-        """Handle replication updates from primary server"""
+    def _apply_update(self, operation, data):
+        """Apply one replicated operation (caller holds db_lock)"""
+        if operation == "vote":
+            # Update voter's vote status
+            voter_id = data["voter_id"]
+            candidate = data["candidate"]
+            
+            voter = self.voters_db.get(voter_id)
+            if voter:
+                # The vote goes in first: snapshots copy records without
+                # db_lock and must never see has_voted without it
+                voter["vote"] = candidate
+                voter["has_voted"] = True
+                logger.info(f"Replicated vote: Voter {voter_id} voted for {candidate}")
+        
+        elif operation == "register":
+            # Add new voter
+            new_voter = data.copy()
+            
+            # Add unless a voter with this id already exists
+            if self.voters_db.add(new_voter):
+                logger.info(f"Replicated registration: {new_voter['name']} (ID: {new_voter['id']})")
+        
+        elif operation == "set_timer":
+            # Update voting deadline
+            self.voting_deadline = data["end_time"]
+            logger.info(f"Replicated timer setting: {datetime.fromtimestamp(data['end_time'])}")
+        
+        elif operation == "start_vote":
+            # Start voting
+            self.voting_active = True
+            self.results_published = False
+            logger.info("Replicated voting start")
+        
+        elif operation == "stop_vote":
+            # Stop voting
+            self.voting_active = False
+            logger.info("Replicated voting stop")
+        
+        elif operation == "publish_results":
+            # Mark results as published
+            self.results_published = True
+            logger.info("Replicated results publication")
+        
+        elif operation == "noop":
+            # Placeholder for an operation the primary aborted
+            pass
+        
+        else:
+            logger.warning(f"Unknown replication operation: {operation}")
+            return False
+        
+        return True
+    
+    def _apply_replicated(self, operation, data, epoch, seq, clock=None, committed=None):
+        """Stage a replicated operation and apply whatever is now settled (caller holds db_lock).
+
+        Operations pushed by the primary are only prepared: they wait in
+        staged until its SettleReplicated marker says whether they
+        committed. Settled operations are applied strictly in seq order, so
+        an operation the primary aborted is never applied and a vote never
+        lands before the registration it depends on. Catch-up passes
+        committed=True, since FetchLogSince only returns settled operations
+        (aborted ones as no-ops). Operations from another epoch are dropped
+        and trigger a resync from the primary; pushes check _accepts first
+        so that the primary does not count them as acknowledged.
+
+        Returns the WAL seq of the last logged record, if any.
+        """
+        if seq is None:
+            return self._apply_logged(operation, data, None, clock)
+        if epoch != self.epoch:
+            self.needs_resync = True
+            return None
+        if seq <= self.applied_seq:
+            return None
+        if committed is None:
+            self.staged.setdefault(seq, (operation, data, clock))
+        else:
+            self.staged[seq] = (operation, data, clock)
+            self.settled[seq] = committed
+        return self._apply_settled()
+    
+    def _accepts(self, epoch, seq):
+        """Whether a pushed operation can be staged (caller holds db_lock).
+
+        A replica that is not on the primary's epoch, or is waiting to
+        resync, cannot order the operation against its state, so it refuses
+        it and starts catching up at once rather than at the next poll.
+        """
+        if seq is None or (epoch == self.epoch and not self.needs_resync):
+            return True
+        self.needs_resync = True
+        self.catchup_requested.set()
+        return False
+    
+    def _apply_settled(self):
+        """Apply staged operations from applied_seq + 1 on while each is settled (caller holds db_lock)"""
+        log_seq = None
+        next_seq = self.applied_seq + 1
+        while next_seq in self.staged and next_seq in self.settled:
+            operation, data, clock = self.staged.pop(next_seq)
+            if not self.settled.pop(next_seq):
+                operation, data = "noop", {}
+            self.applied_seq = next_seq
+            log_seq = self._apply_logged(operation, data, next_seq, clock) or log_seq
+            next_seq += 1
+        return log_seq
+    
+    def _apply_logged(self, operation, data, source_seq, clock):
+        """Apply one operation and append it to the WAL (caller holds db_lock)"""
+        if clock is not None:
+            stamp = decode(clock)
+            self.clock.update(stamp)
+            self.applied_clock = max(self.applied_clock, stamp)
+        self._apply_update(operation, data)
+        if self.wal is None:
+            return None
+        return self.wal.append(operation, data, source_seq)
+    
+    def _snapshot_boundary(self):
+        """Replica state as of a snapshot's WAL boundary (caller holds db_lock)"""
+        return {
+            "voting_active": self.voting_active,
+            "voting_deadline": self.voting_deadline,
+            "results_published": self.results_published,
+            "epoch": self.epoch,
+            "applied_seq": self.applied_seq,
+            "applied_clock": encode(self.applied_clock)
+        }
+    
+    def _snapshot_state(self, boundary):
+        """Durable state for a snapshot, copying the voters without holding db_lock.
+
+        Records may already show operations applied after the boundary;
+        replaying those from the WAL is harmless.
+        """
+        return dict(boundary, voters=[dict(voter) for voter in self.voters_db])
+    
+    def _restore_state(self, state):
+        """Replace in-memory state with a snapshot (caller holds db_lock or is initialising)"""
+        self.voters_db = VoterStore(state["voters"])
+        self.voting_active = state["voting_active"]
+        self.voting_deadline = state["voting_deadline"]
+        self.results_published = state["results_published"]
+        self.epoch = state.get("epoch")
+        self.applied_seq = state.get("applied_seq", 0)
+        self.staged = {}
+        self.settled = {}
+        self.applied_clock = decode(state.get("applied_clock"))
+        self.clock.update(self.applied_clock)
+        self.needs_resync = self.epoch is None
+    
+    def _recover_from_wal(self):
+        """Load the latest snapshot and replay the WAL tail after it"""
+        start = time.time()
+        seq, state = self.wal.load_snapshot()
+        if state is not None:
+            self._restore_state(state)
+        
+        # Silence the per-operation log lines while replaying
+        level = logger.level
+        logger.setLevel(logging.WARNING)
+        replayed = 0
+        try:
+            for record in self.wal.replay(seq):
+                # Operations are logged in seq order, so the last source seq is the position
+                if record.get("source_seq") is not None:
+                    self.applied_seq = max(self.applied_seq, record["source_seq"])
+                self._apply_update(record["op"], record["data"])
+                replayed += 1
+        finally:
+            logger.setLevel(level)
+        
+        logger.info(f"Recovered from snapshot at seq {seq} plus {replayed} logged operations "
+                    f"in {time.time() - start:.2f}s")
+    
+    def _sync_log(self, seq):
+        """Wait until logged operations are durable, then snapshot if one is due"""
+        if self.wal is None or seq is None:
+            return
+        self.wal.sync(seq)
+        if not self.wal.snapshot_due():
+            return
+        
+        with self.db_lock:
+            if self.snapshot_in_progress:
+                return
+            self.snapshot_in_progress = True
+            snapshot_seq = self.wal.begin_snapshot()
+            boundary = self._snapshot_boundary()
+        
+        snapshot_thread = threading.Thread(target=self._write_snapshot, args=(snapshot_seq, boundary), daemon=True)
+        snapshot_thread.start()
+    
+    def _write_snapshot(self, seq, boundary):
         try:
+            self.wal.write_snapshot(seq, self._snapshot_state(boundary))
+        except Exception as e:
+            logger.error(f"Failed to write snapshot at seq {seq}: {e}")
+        finally:
             with self.db_lock:
-                if operation == "vote":
-                    # Update voter's vote status
-                    voter_id = data["voter_id"]
-                    candidate = data["candidate"]
-                    
-                    for voter in self.voters_db:
-                        if voter["id"] == voter_id:
-                            voter["has_voted"] = True
-                            voter["vote"] = candidate
-                            logger.info(f"Replicated vote: Voter {voter_id} voted for {candidate}")
-                            break
-                
-                elif operation == "register":
-                    # Add new voter
-                    new_voter = data.copy()
-                    
-                    # Check if voter already exists
-                    exists = False
-                    for voter in self.voters_db:
-                        if voter["id"] == new_voter["id"]:
-                            exists = True
-                            break
-                    
-                    if not exists:
-                        self.voters_db.append(new_voter)
-                        logger.info(f"Replicated registration: {new_voter['name']} (ID: {new_voter['id']})")
-                
-                elif operation == "set_timer":
-                    # Update voting deadline
-                    self.voting_deadline = data["end_time"]
-                    logger.info(f"Replicated timer setting: {datetime.fromtimestamp(data['end_time'])}")
-                
-                elif operation == "start_vote":
-                    # Start voting
-                    self.voting_active = True
-                    self.results_published = False
-                    logger.info("Replicated voting start")
-                
-                elif operation == "stop_vote":
-                    # Stop voting
-                    self.voting_active = False
-                    logger.info("Replicated voting stop")
+                self.snapshot_in_progress = False
+    
+    def _catch_up_periodically(self):
+        """Background thread pulling missed operations from the primary"""
+        while True:
+            try:
+                self._catch_up()
+                if not self.primary_reachable:
+                    logger.info("Primary reachable again; catch-up resumed")
+                self.primary_reachable = True
+            except Exception as e:
+                if self.primary_reachable:
+                    logger.warning(f"Catch-up from primary failed: {e}")
+                self.primary_reachable = False
+            self.catchup_requested.wait(self.catchup_interval)
+            self.catchup_requested.clear()
+    
+    def _catch_up(self):
+        """Fetch and apply the primary's log suffix after applied_seq.
+
+        Falls back to a full snapshot only when this replica is on another
+        epoch (the primary or this replica restarted without shared history)
+        or has fallen behind the primary's retained log.
+        """
+        with self.primary.connection() as primary:
+            resynced = False
+            if self.needs_resync:
+                self._resync_from_snapshot(primary)
+                resynced = True
+            
+            while True:
+                with self.db_lock:
+                    epoch, since = self.epoch, self.applied_seq
+                response = primary.FetchLogSince(epoch, since, self.catchup_batch)
+                if response["resync"]:
+                    if resynced:
+                        return
+                    self._resync_from_snapshot(primary)
+                    resynced = True
+                    continue
                 
-                elif operation == "publish_results":
-                    # Mark results as published
-                    self.results_published = True
-                    logger.info("Replicated results publication")
+                log_seq = None
+                with self.db_lock:
+                    if self.epoch != epoch:
+                        return
+                    for entry in response["entries"]:
+                        log_seq = self._apply_replicated(entry["operation"], entry["data"], epoch, entry["seq"],
+                                                         entry.get("clock"), committed=True) or log_seq
+                    caught_up = self.applied_seq >= response["last_seq"] or self.applied_seq == since
+                self._sync_log(log_seq)
                 
-                else:
-                    logger.warning(f"Unknown replication operation: {operation}")
+                if response["entries"]:
+                    logger.info(f"Caught up {len(response['entries'])} operations (applied seq {self.applied_seq})")
+                if caught_up:
+                    return
+    
+    def _resync_from_snapshot(self, primary):
+        """Replace local state with the primary's snapshot"""
+        response = primary.FetchSnapshot()
+        with self.db_lock:
+            state = dict(response["state"], epoch=response["epoch"], applied_seq=response["seq"],
+                         applied_clock=response.get("clock"))
+            self._restore_state(state)
+            if self.wal is not None:
+                snapshot_seq = self.wal.begin_snapshot()
+                boundary = self._snapshot_boundary()
+        
+        if self.wal is not None:
+            self.wal.write_snapshot(snapshot_seq, self._snapshot_state(boundary))
+        logger.info(f"Resynchronized from primary snapshot at seq {response['seq']} (epoch {response['epoch']})")
+    
+    def ReplicateUpdate(self, operation, data, epoch=None, seq=None, clock=None):
+        """Handle replication updates from primary server"""
+        try:
+            if operation not in REPLICATED_OPERATIONS:
+                logger.warning(f"Unknown replication operation: {operation}")
+                return False
+            
+            with self.db_lock:
+                if not self._accepts(epoch, seq):
                     return False
+                log_seq = self._apply_replicated(operation, data, epoch, seq, clock)
             
+            self._sync_log(log_seq)
             return True
             
         except Exception as e:
             logger.error(f"Error processing replication update: {e}")
             return False
     
-    def GetVoterDatabase(self):
-        """Get current voter database (for debugging/monitoring)"""
+    def SettleReplicated(self, epoch, committed, aborted):
+        """Record the primary's commit/abort decision for staged operations by seq"""
+        try:
+            with self.db_lock:
+                if epoch != self.epoch:
+                    return False
+                for seq in committed:
+                    if seq > self.applied_seq:
+                        self.settled[seq] = True
+                for seq in aborted:
+                    if seq > self.applied_seq:
+                        self.settled[seq] = False
+                log_seq = self._apply_settled()
+            
+            self._sync_log(log_seq)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error settling replicated operations: {e}")
+            return False
+    
+    def ReplicateBatch(self, operations, epoch=None):
+        """Apply a batch of replicated operations from the primary atomically.
+
+        Each entry is {"operation": ..., "data": ..., "seq": ..., "clock": ...}. The whole batch is
+        checked before anything is staged, so either every operation is
+        staged or none is.
+        """
+        try:
+            for entry in operations:
+                if entry["operation"] not in REPLICATED_OPERATIONS:
+                    logger.warning(f"Rejected batch with unknown operation: {entry['operation']}")
+                    return False
+                if entry["operation"] == "vote" and not {"voter_id", "candidate"} <= entry["data"].keys():
+                    logger.warning("Rejected batch with malformed vote")
+                    return False
+            
+            log_seq = None
+            with self.db_lock:
+                if not all(self._accepts(epoch, entry.get("seq")) for entry in operations):
+                    return False
+                for entry in operations:
+                    log_seq = self._apply_replicated(entry["operation"], entry["data"], epoch,
+                                                     entry.get("seq"), entry.get("clock")) or log_seq
+            
+            self._sync_log(log_seq)
+            logger.info(f"Replicated batch of {len(operations)} operations")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error processing replication batch: {e}")
+            return False
+    
+    def GetVoterDatabase(self, query=None):
+        """Get voter records (for debugging/monitoring).
+
+        Without a query every record is returned. A query dict returns one
+        page in id order, filtered by start_id/end_id, has_voted and
+        name_prefix, projected onto `fields`, at most `limit` records
+        (default 100, max 1000). Pass the returned next_id as start_id to
+        fetch the next page; it is absent once the range is exhausted.
+        """
+        if query is None:
+            with self.db_lock:
+                return {"success": True, "voters": self.voters_db.records()}
+        try:
+            query_args = voter_query_args(query)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "message": str(e)}
         with self.db_lock:
-            return {"success": True, "voters": self.voters_db.copy()}
+            voters, next_id = self.voters_db.query(**query_args)
+        response = {"success": True, "voters": voters}
+        if next_id is not None:
+            response["next_id"] = next_id
+        return response
+    
+    def GetVoterStatus(self, voter_id):
+        """Point lookup of one voter's id, name and has_voted flag"""
+        with self.db_lock:
+            voter = self.voters_db.get(voter_id)
+            if voter is None:
+                return {"success": False, "message": "Voter not found"}
+            return {"success": True, "id": voter["id"], "name": voter["name"], "has_voted": voter["has_voted"]}
     
     def GetReplicaStatus(self):
         """Get replica status"""
@@ -118,7 +465,12 @@ class ReplicaServer:
             "voting_active": self.voting_active,
             "deadline": self.voting_deadline,
             "results_published": self.results_published,
-            "voter_count": len(self.voters_db)
+            "voter_count": len(self.voters_db),
+            "epoch": self.epoch,
+            "applied_seq": self.applied_seq,
+            "staged": len(self.staged),
+            "applied_clock": encode(self.applied_clock),
+            "clock": encode(self.clock.last)
         }
     
     def HealthCheck(self):
@@ -127,9 +479,12 @@ class ReplicaServer:
 
 def main():
     """Start the replica server"""
-    if len(sys.argv) != 2:
-        print("Usage: python replica.py <port>")
-        print("Example: python replica.py 8001")
+    # Log records are written by a background listener, never on the calling thread
+    configure_logging(logging.INFO)
+    
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python replica.py <port> [data_dir]")
+        print("Example: python replica.py 8001 data/replica-8001")
         sys.exit(1)
     
     try:
@@ -138,16 +493,21 @@ def main():
         print("Error: Port must be a number")
         sys.exit(1)
     
-    replica = ReplicaServer(port)
+    data_dir = sys.argv[2] if len(sys.argv) == 3 else None
+    replica = ReplicaServer(port, data_dir=data_dir)
     
     # Create XML-RPC server
-    rpc_server = SimpleXMLRPCServer(("localhost", port), allow_none=True)
+    rpc_server = ThreadedXMLRPCServer(("localhost", port), requestHandler=KeepAliveRequestHandler,
+                                      allow_none=True)
     rpc_server.register_instance(replica)
     
     print(f"Replica Server starting on port {port}...")
     print("Available RPC methods:")
-    print("- ReplicateUpdate(operation, data)")
-    print("- GetVoterDatabase()")
+    print("- ReplicateUpdate(operation, data, epoch, seq, clock)")
+    print("- ReplicateBatch(operations, epoch)")
+    print("- SettleReplicated(epoch, committed, aborted)")
+    print("- GetVoterDatabase(query)")
+    print("- GetVoterStatus(voter_id)")
     print("- GetReplicaStatus()")
     print("- HealthCheck()")
     
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - RPC Transport
+Keep-alive XML-RPC transport and a thread-safe ServerProxy pool
+"""
+
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from xmlrpc.client import Fault, ServerProxy, Transport
+from xmlrpc.server import SimpleXMLRPCRequestHandler
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingRequestHandler(SimpleXMLRPCRequestHandler):
+    """Request handler whose access log goes through logging instead of stderr.
+
+    BaseHTTPRequestHandler writes one line to stderr per request on the
+    handling thread; routed through logging it takes the same path as the
+    rest of the process's log output.
+    """
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+
+class KeepAliveRequestHandler(LoggingRequestHandler):
+    """Request handler that keeps HTTP/1.1 connections open between calls.
+
+    Idle connections are dropped after `timeout` seconds so a vanished
+    client does not pin a server thread forever.
+    """
+    protocol_version = "HTTP/1.1"
+    timeout = 60
+
+
+class KeepAliveTransport(Transport):
+    """Transport that reuses its HTTP connection and applies a socket timeout"""
+
+    def __init__(self, timeout=None, **kwargs):
+        super().__init__(**kwargs)
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        if self.timeout is not None:
+            connection.timeout = self.timeout
+        return connection
+
+
+class ServerProxyPool:
+    """Thread-safe pool of keep-alive ServerProxy connections to one endpoint.
+
+    A ServerProxy owns a single HTTP connection and must not be shared by
+    concurrent callers, so each caller checks one out for the duration of a
+    call. Up to `size` idle proxies are kept for reuse. Unhealthy proxies are
+    evicted:
+
+    - a proxy whose call failed at the transport level is closed; if the
+      connection was refused or reset, every idle proxy goes with it, since
+      their connections to the same endpoint are likely just as dead (e.g.
+      the server restarted)
+    - a proxy idle for more than `max_idle` seconds is closed at checkout
+      rather than reused, so callers rarely hit a connection the server has
+      already timed out
+    """
+
+    def __init__(self, url, size=4, timeout=None, max_idle=None):
+        self.url = url
+        self.size = size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.discarded = 0
+
+    def _create(self):
+        with self._lock:
+            self.created += 1
+        transport = KeepAliveTransport(timeout=self.timeout)
+        return ServerProxy(self.url, transport=transport, allow_none=True)
+
+    def _discard(self, proxy):
+        with self._lock:
+            self.discarded += 1
+        try:
+            proxy("close")()
+        except Exception:
+            pass
+
+    def _checkout(self):
+        while True:
+            try:
+                proxy, released_at = self._idle.get_nowait()
+            except queue.Empty:
+                return self._create()
+            if self.max_idle is None or time.monotonic() - released_at <= self.max_idle:
+                return proxy
+            self._discard(proxy)
+
+    @contextmanager
+    def connection(self):
+        """Check out a proxy for one or more calls"""
+        proxy = self._checkout()
+        try:
+            yield proxy
+        except Fault:
+            # Application-level error; the connection itself is still good
+            self._release(proxy)
+            raise
+        except ConnectionError:
+            self._discard(proxy)
+            self.close()
+            raise
+        except Exception:
+            self._discard(proxy)
+            raise
+        else:
+            self._release(proxy)
+
+    def _release(self, proxy):
+        if self._idle.qsize() < self.size:
+            self._idle.put((proxy, time.monotonic()))
+        else:
+            self._discard(proxy)
+
+    def close(self):
+        """Close every idle connection"""
+        while True:
+            try:
+                proxy, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(proxy)
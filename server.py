@@ -4,43 +4,160 @@ Distributed Voting System - Main Server
 Implements RPC endpoints, mutual exclusion, replication, and load balancing
 """
 
+import argparse
+import itertools
+import os
+import secrets
+import sys
 import threading
 import time
 import json
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError, as_completed
 from xmlrpc.server import SimpleXMLRPCServer
-from xmlrpc.client import ServerProxy
-from collections import deque
+from collections import OrderedDict, deque
 import heapq
 from datetime import datetime, timedelta
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from async_logging import configure_logging
+from hybrid_clock import HybridLogicalClock, decode, encode
+from notification_bus import NotificationBus
+from session_store import SessionStore
+from rpc_transport import KeepAliveRequestHandler, LoggingRequestHandler, ServerProxyPool
+from voter_store import VoterStore, default_voters, voter_query_args
+from wal import WriteAheadLog
+
 logger = logging.getLogger(__name__)
 
+class PooledXMLRPCServer(SimpleXMLRPCServer):
+    """XML-RPC server that handles each request on a fixed pool of worker threads.
+
+    SimpleXMLRPCServer serves one request at a time, so a slow replication
+    round trip blocks every other caller. Here the accept loop only hands the
+    connection to the pool and goes straight back to accepting.
+    """
+
+    def __init__(self, addr, workers=8, **kwargs):
+        super().__init__(addr, **kwargs)
+        self.workers = workers
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rpc-worker")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False)
+
+
+def create_rpc_server(host="localhost", port=8000, mode="threaded", workers=8, keep_alive=0):
+    """Create the XML-RPC front end in the requested serving mode.
+
+    keep_alive > 0 lets clients reuse their HTTP connection, closing it
+    after that many idle seconds. An open connection occupies a worker
+    for as long as it stays open, so only enable it in threaded mode with
+    more workers than the clients' combined pool sizes.
+    """
+    handler = LoggingRequestHandler
+    if keep_alive > 0:
+        class handler(KeepAliveRequestHandler):
+            timeout = keep_alive
+    if mode == "single":
+        rpc_server = SimpleXMLRPCServer((host, port), requestHandler=handler, allow_none=True)
+    elif mode == "threaded":
+        rpc_server = PooledXMLRPCServer((host, port), workers=workers, requestHandler=handler,
+                                        allow_none=True)
+    else:
+        raise ValueError(f"Unknown serving mode: {mode}")
+    # system.multicall lets clients batch several calls into one round trip
+    rpc_server.register_multicall_functions()
+    return rpc_server
+
+def count_votes(voters, candidates):
+    """Count votes per candidate by walking every voter record"""
+    counts = {candidate: 0 for candidate in candidates}
+    for voter in voters:
+        if voter["has_voted"] and voter["vote"] in counts:
+            counts[voter["vote"]] += 1
+    return counts
+
+def reconcile_tally(voters, candidates, tally):
+    """Compare running counters with a full count; returns {candidate: (counter, actual)} for mismatches"""
+    actual = count_votes(voters, candidates)
+    return {
+        candidate: (tally.get(candidate, 0), actual[candidate])
+        for candidate in candidates
+        if tally.get(candidate, 0) != actual[candidate]
+    }
+
 class VotingServer:
-    def __init__(self, port=8000, replica_ports=[8001, 8002]):
+    def __init__(self, port=8000, replica_ports=[8001, 8002], max_concurrent_votes=5,
+                 replication_quorum=None, replication_timeout=2.0,
+                 batch_window=0.0, batch_size=64,
+                 data_dir=None, fsync_policy="group", snapshot_every=10000,
+                 replication_log_size=100000, session_ttl=3600.0, session_shards=16,
+                 receipt_capacity=10000, max_vote_wait=30.0):
         self.port = port
         self.replica_ports = replica_ports
-        self.replicas = []
-        
-        # Lamport clock for mutual exclusion
-        self.lamport_clock = 0
-        self.clock_lock = threading.Lock()
-        
-        # Voter database - static in-memory array
-        self.voters_db = [
-            {"id": 1, "name": "Alice", "has_voted": False, "vote": None},
-            {"id": 2, "name": "Bob", "has_voted": False, "vote": None},
-            {"id": 3, "name": "Charlie", "has_voted": False, "vote": None},
-            {"id": 4, "name": "Diana", "has_voted": False, "vote": None},
-            {"id": 5, "name": "Eve", "has_voted": False, "vote": None},
-            {"id": 6, "name": "Frank", "has_voted": False, "vote": None},
-            {"id": 7, "name": "Grace", "has_voted": False, "vote": None},
-            {"id": 8, "name": "Henry", "has_voted": False, "vote": None},
-            {"id": 9, "name": "Ivy", "has_voted": False, "vote": None},
-            {"id": 10, "name": "Jack", "has_voted": False, "vote": None}
-        ]
+        # Pooled keep-alive connections to each replica, reused across operations
+        self.replicas = {
+            replica_port: ServerProxyPool(f"http://localhost:{replica_port}",
+                                          timeout=replication_timeout)
+            for replica_port in replica_ports
+        }
+        # Replica acks needed to commit; by default the primary plus these form a majority
+        if replication_quorum is None:
+            replication_quorum = (len(replica_ports) + 1) // 2
+        self.replication_quorum = replication_quorum
+        self.replication_timeout = replication_timeout
+        # Replicas are contacted concurrently, each through its own workers so a hung
+        # replica cannot tie up calls to healthy ones; stragglers finish there after
+        # quorum is reached. A replica with every worker busy fails new calls at once;
+        # the headroom covers stragglers behind the quorum and settlement calls.
+        self.replica_max_inflight = 4 * (max_concurrent_votes + 1)
+        self.replica_executors = {
+            replica_port: ThreadPoolExecutor(max_workers=self.replica_max_inflight,
+                                             thread_name_prefix=f"replicator-{replica_port}")
+            for replica_port in replica_ports
+        }
+        self.replica_inflight = {replica_port: 0 for replica_port in replica_ports}
+        self.replica_saturated = set()
+        self.replica_inflight_lock = threading.Lock()
+        # Group commit: votes waiting up to batch_window seconds (or until batch_size
+        # accumulate) are shipped as one ReplicateBatch call. A window of 0 disables it.
+        self.batch_window = batch_window
+        self.batch_size = batch_size
+        self.replication_batch = []
+        self.batch_cond = threading.Condition()
+        # Every replicated operation carries (epoch, seq). The epoch changes whenever the
+        # primary restarts, even twice within a second in one process; the recent log
+        # lets a lagging replica fetch only what it missed.
+        self.replication_epoch = f"{int(time.time())}-{os.getpid()}-{secrets.token_hex(4)}"
+        self.replication_seq = 0
+        self.replication_log = deque(maxlen=replication_log_size)
+        self.replication_inflight = set()
+        self.replication_log_lock = threading.Lock()
+        # Replicas only stage pushed operations; each one is applied once its
+        # (seq, committed) marker arrives through SettleReplicated. Markers wait
+        # here per replica, with at most one call in flight to each (all guarded
+        # by settle_cond).
+        self.unshipped_settlements = {replica_port: [] for replica_port in replica_ports}
+        self.settling_replicas = set()
+        self.settle_cond = threading.Condition()
+        
+        # Hybrid logical clock stamping every state change; replicas order by it
+        self.clock = HybridLogicalClock()
+        
+        # Voter database - in-memory store indexed by id and name
+        self.voters_db = VoterStore(default_voters())
         
         # Candidates list
         self.candidates = [
@@ -48,35 +165,60 @@ class VotingServer:
             "Candidate F", "Candidate G", "Candidate H", "Candidate I", "Candidate J"
         ]
         
+        # Per-candidate vote counters, updated when a vote commits (guarded by db_lock)
+        self.tally = {candidate: 0 for candidate in self.candidates}
+        
         # Voting state
         self.voting_active = False
         self.voting_deadline = None
         self.results_published = False
         
         # Concurrency control
-        self.max_concurrent_votes = 5
+        self.max_concurrent_votes = max_concurrent_votes
+        # Votes admitted to the worker pool and not yet finished (guarded by vote_queue_cond)
         self.active_votes = 0
+        self.vote_executor = ThreadPoolExecutor(max_workers=max_concurrent_votes,
+                                                thread_name_prefix="vote-worker")
         # Use a priority queue (heap) for votes to enforce ordering by (timestamp, voter_id)
-        # Each heap entry: (timestamp, voter_id, counter, vote_request)
+        # Each heap entry: (timestamp, voter_id, counter, vote_request, ticket); at most one per voter
         self.vote_queue = []
         self.vote_queue_lock = threading.Lock()
+        # Signalled when a vote is enqueued or a processing slot frees up
+        self.vote_queue_cond = threading.Condition(self.vote_queue_lock)
         self.vote_counter = 0  # tie-breaker for heap entries
-        self.vote_lock = threading.Lock()
-        # Track voter ids currently being processed to prevent concurrent votes by same voter
-        self.in_progress_votes = set()
-        self.in_progress_lock = threading.Lock()
+        # Voter id -> ticket of their vote while it is queued or being processed
+        # (guarded by vote_queue_cond); further votes from them are rejected at enqueue time
+        self.pending_voters = {}
+        self.duplicate_votes = 0
+        # Ticket -> Future resolving to the vote's outcome, oldest first; settled receipts
+        # beyond receipt_capacity are dropped (guarded by vote_queue_cond)
+        self.vote_receipts = OrderedDict()
+        self.receipt_capacity = receipt_capacity
+        # Longest a Vote(..., wait=True) call blocks an RPC worker
+        self.max_vote_wait = max_vote_wait
         
-        # Session management
-        self.active_sessions = {}
-        self.session_lock = threading.Lock()
+        # Session management: random tokens, expiring session_ttl seconds after login;
+        # lookups are lock-free and writes lock only one of session_shards shards
+        self.sessions = SessionStore(ttl=session_ttl, shards=session_shards)
         
         # Notifications and logs
-        self.notifications = deque(maxlen=100)
-        self.notification_subscribers = []
-        self.notification_lock = threading.Lock()
+        # Publishing only enqueues; a dispatcher thread numbers, logs and fans out
+        self.notifications = NotificationBus(history=100)
         
         # Database lock for thread safety
         self.db_lock = threading.Lock()
+        # Voter ids and names reserved by a commit whose replication is in flight
+        # (guarded by db_lock, which is not held while replicating)
+        self.pending_votes = set()
+        self.pending_registrations = {}
+        
+        # Durable write-ahead log of committed operations; without a data_dir
+        # all state stays in memory as before
+        self.wal = None
+        self.snapshot_in_progress = False
+        if data_dir:
+            self.wal = WriteAheadLog(data_dir, fsync_policy=fsync_policy, snapshot_every=snapshot_every)
+            self._recover_from_wal()
         
         # Start background threads
         self.start_background_threads()
@@ -87,123 +229,398 @@ class VotingServer:
         queue_thread = threading.Thread(target=self._process_vote_queue, daemon=True)
         queue_thread.start()
         
+        # Group-commit flusher for batched vote replication
+        if self.batch_window > 0:
+            batch_thread = threading.Thread(target=self._flush_replication_batches, daemon=True)
+            batch_thread.start()
+        
+        # Commit/abort markers for replicas
+        if self.replica_ports:
+            settle_thread = threading.Thread(target=self._ship_settlements, daemon=True)
+            settle_thread.start()
+        
         # Time sync broadcaster
         sync_thread = threading.Thread(target=self._broadcast_time_sync, daemon=True)
         sync_thread.start()
         
-    def _increment_lamport_clock(self):
-        """Increment Lamport clock"""
-        with self.clock_lock:
-            self.lamport_clock += 1
-            return self.lamport_clock
+    def _add_notification(self, message):
+        """Add notification to the log without blocking the caller"""
+        self.notifications.publish(message)
     
-    def _update_lamport_clock(self, received_clock):
-        """Update Lamport clock based on received timestamp"""
-        with self.clock_lock:
-            self.lamport_clock = max(self.lamport_clock, received_clock) + 1
-            return self.lamport_clock
+    def _snapshot_boundary(self):
+        """Voting state as of a snapshot's WAL boundary (caller holds db_lock)"""
+        return {
+            "voting_active": self.voting_active,
+            "voting_deadline": self.voting_deadline,
+            "results_published": self.results_published
+        }
     
-    def _add_notification(self, message):
-        """Add notification to the log"""
-        timestamp = datetime.now().isoformat()
-        notification = {"timestamp": timestamp, "message": message}
+    def _snapshot_state(self, boundary):
+        """Durable state for a snapshot, copying the voters without holding db_lock.
+
+        Records may already show operations committed after the boundary.
+        Replaying those is harmless: a vote for a voter who has voted is
+        skipped and a registration of a known id is not re-added. The tally
+        is counted from the copied records so that it agrees with them.
+        """
+        voters = [dict(voter) for voter in self.voters_db]
+        return dict(boundary, voters=voters, tally=count_votes(voters, self.candidates))
+    
+    def _restore_state(self, state):
+        """Replace in-memory state with a snapshot"""
+        self.voters_db = VoterStore(state["voters"])
+        self.voting_active = state["voting_active"]
+        self.voting_deadline = state["voting_deadline"]
+        self.results_published = state["results_published"]
+        if "tally" in state:
+            self.tally = dict(state["tally"])
+        else:
+            self.tally = count_votes(self.voters_db, self.candidates)
+    
+    def _apply_logged_operation(self, operation, data):
+        """Re-apply one committed operation read back from the WAL"""
+        if operation == "vote":
+            voter = self.voters_db.get(data["voter_id"])
+            if voter and not voter["has_voted"]:
+                voter["vote"] = data["candidate"]
+                voter["has_voted"] = True
+                self.tally[data["candidate"]] = self.tally.get(data["candidate"], 0) + 1
+        elif operation == "register":
+            self.voters_db.add(dict(data))
+        elif operation == "set_timer":
+            self.voting_deadline = data["end_time"]
+        elif operation == "start_vote":
+            self.voting_active = True
+            self.results_published = False
+        elif operation == "stop_vote":
+            self.voting_active = False
+        elif operation == "publish_results":
+            self.results_published = True
+        else:
+            logger.warning(f"Skipping unknown logged operation: {operation}")
+    
+    def _recover_from_wal(self):
+        """Load the latest snapshot and replay the WAL tail after it"""
+        start = time.time()
+        seq, state = self.wal.load_snapshot()
+        if state is not None:
+            self._restore_state(state)
         
-        with self.notification_lock:
-            self.notifications.append(notification)
-            logger.info(f"Notification: {message}")
+        replayed = 0
+        for record in self.wal.replay(seq):
+            self._apply_logged_operation(record["op"], record["data"])
+            replayed += 1
+        
+        logger.info(f"Recovered from snapshot at seq {seq} plus {replayed} logged operations "
+                    f"in {time.time() - start:.2f}s")
+    
+    def _log_operation(self, operation, data):
+        """Append a committed operation to the WAL (caller holds db_lock); returns its seq"""
+        if self.wal is None:
+            return None
+        return self.wal.append(operation, data)
+    
+    def _sync_log(self, seq):
+        """Wait until a logged operation is durable, then snapshot if one is due"""
+        if self.wal is None or seq is None:
+            return
+        self.wal.sync(seq)
+        if self.wal.snapshot_due():
+            self._start_snapshot()
     
-    def _replicate_to_replicas(self, operation, data):
-        """Replicate operation to replica servers"""
-        successful_replicas = 0
+    def _start_snapshot(self):
+        """Mark a WAL boundary, then copy the state and write it out in the background"""
+        with self.db_lock:
+            if self.snapshot_in_progress:
+                return
+            self.snapshot_in_progress = True
+            seq = self.wal.begin_snapshot()
+            boundary = self._snapshot_boundary()
         
-        for replica_port in self.replica_ports:
+        snapshot_thread = threading.Thread(target=self._write_snapshot, args=(seq, boundary), daemon=True)
+        snapshot_thread.start()
+    
+    def _write_snapshot(self, seq, boundary):
+        try:
+            self.wal.write_snapshot(seq, self._snapshot_state(boundary))
+        except Exception as e:
+            logger.error(f"Failed to write snapshot at seq {seq}: {e}")
+        finally:
+            with self.db_lock:
+                self.snapshot_in_progress = False
+    
+    def _replicate_to_replica(self, replica_port, method, *args):
+        """Call one replication RPC on one replica; returns True if it acknowledged"""
+        try:
+            with self.replicas[replica_port].connection() as replica:
+                return bool(getattr(replica, method)(*args))
+        except Exception as e:
+            logger.error(f"Failed to replicate to replica on port {replica_port}: {e}")
+            return False
+    
+    def _submit_to_replica(self, replica_port, method, *args):
+        """Start a replication RPC on one replica's executor; returns a future of its ack.
+
+        When replica_max_inflight calls to this replica are already running
+        (it is hung or far behind) the future fails at once instead of
+        queueing behind them.
+        """
+        with self.replica_inflight_lock:
+            saturated = self.replica_inflight[replica_port] >= self.replica_max_inflight
+            if saturated:
+                first = replica_port not in self.replica_saturated
+                self.replica_saturated.add(replica_port)
+            else:
+                self.replica_inflight[replica_port] += 1
+                self.replica_saturated.discard(replica_port)
+        if saturated:
+            if first:
+                logger.warning(f"Replica on port {replica_port} has {self.replica_max_inflight} calls "
+                               f"in flight; failing new calls until one finishes")
+            future = Future()
+            future.set_result(False)
+            return future
+        
+        future = self.replica_executors[replica_port].submit(self._replicate_to_replica, replica_port,
+                                                             method, *args)
+        future.add_done_callback(lambda _: self._release_replica_slot(replica_port))
+        return future
+    
+    def _release_replica_slot(self, replica_port):
+        with self.replica_inflight_lock:
+            self.replica_inflight[replica_port] -= 1
+    
+    def _new_replication_entry(self, operation, data):
+        """Assign the next replication sequence number and clock stamp and record them in the log.
+
+        Stamping under replication_log_lock keeps clock order equal to seq order.
+        """
+        with self.replication_log_lock:
+            self.replication_seq += 1
+            entry = {"seq": self.replication_seq, "operation": operation, "data": data,
+                     "clock": encode(self.clock.tick())}
+            self.replication_log.append(entry)
+            self.replication_inflight.add(entry["seq"])
+        return entry
+    
+    def _finish_replication_entry(self, entry, committed):
+        """Settle a logged operation once the primary has committed or aborted it.
+
+        Aborted operations become no-ops for catch-up. Until this is called
+        the entry counts as in flight, which keeps it out of FetchSnapshot.
+        The outcome is queued for replicas, which hold the operation staged
+        until it arrives.
+        """
+        with self.replication_log_lock:
+            self.replication_inflight.discard(entry["seq"])
+            if not committed:
+                entry["operation"] = "noop"
+                entry["data"] = {}
+        with self.settle_cond:
+            for settlements in self.unshipped_settlements.values():
+                settlements.append((entry["seq"], committed))
+            self.settle_cond.notify()
+    
+    def _ship_settlements(self):
+        """Background thread sending commit/abort markers to replicas as SettleReplicated calls.
+
+        At most one call per replica is in flight; markers that settle
+        meanwhile go out together in its next call. Markers a replica
+        misses (it was down or saturated) are not resent: catch-up returns
+        settled operations, aborted ones as no-ops.
+        """
+        def ready():
+            return [replica_port for replica_port, settlements in self.unshipped_settlements.items()
+                    if settlements and replica_port not in self.settling_replicas]
+        
+        while True:
             try:
-                replica = ServerProxy(f"http://localhost:{replica_port}")
-                result = replica.ReplicateUpdate(operation, data)
-                if result:
-                    successful_replicas += 1
+                with self.settle_cond:
+                    self.settle_cond.wait_for(ready)
+                    batches = {}
+                    for replica_port in ready():
+                        batches[replica_port] = self.unshipped_settlements[replica_port]
+                        self.unshipped_settlements[replica_port] = []
+                        self.settling_replicas.add(replica_port)
+                
+                for replica_port, settlements in batches.items():
+                    committed = [seq for seq, ok in settlements if ok]
+                    aborted = [seq for seq, ok in settlements if not ok]
+                    future = self._submit_to_replica(replica_port, "SettleReplicated",
+                                                     self.replication_epoch, committed, aborted)
+                    future.add_done_callback(lambda _, port=replica_port: self._settlement_shipped(port))
             except Exception as e:
-                logger.error(f"Failed to replicate to replica on port {replica_port}: {e}")
+                logger.error(f"Error shipping replication settlements: {e}")
+    
+    def _settlement_shipped(self, replica_port):
+        with self.settle_cond:
+            self.settling_replicas.discard(replica_port)
+            self.settle_cond.notify()
+    
+    def _replicate_to_replicas(self, operation, data, entry=None):
+        """Replicate operation to replica servers.
+
+        Callers that commit conditionally on the result pass their own entry
+        and settle it after committing; otherwise the primary has already
+        applied the change and the entry is settled here.
+        """
+        if entry is not None:
+            return self._replicate_to_quorum(operation, "ReplicateUpdate", operation, data,
+                                             self.replication_epoch, entry["seq"], entry["clock"])
         
-        # Require majority (2 out of 3 including primary)
-        return successful_replicas >= 1  # Need at least 1 replica + primary = majority
+        entry = self._new_replication_entry(operation, data)
+        try:
+            return self._replicate_to_quorum(operation, "ReplicateUpdate", operation, data,
+                                             self.replication_epoch, entry["seq"], entry["clock"])
+        finally:
+            self._finish_replication_entry(entry, True)
+    
+    def _replicate_to_quorum(self, description, method, *args):
+        """Call a replication RPC on every replica and wait for the quorum.
+
+        All replicas are contacted concurrently and this returns as soon as
+        replication_quorum of them have acknowledged. Replicas that are still
+        in flight finish in the background. Returns False if the quorum
+        becomes unreachable or is not met within replication_timeout.
+        """
+        if self.replication_quorum <= 0:
+            for replica_port in self.replica_ports:
+                self._submit_to_replica(replica_port, method, *args)
+            return True
+        
+        futures = [
+            self._submit_to_replica(replica_port, method, *args)
+            for replica_port in self.replica_ports
+        ]
+        acks = 0
+        pending = len(futures)
+        try:
+            for future in as_completed(futures, timeout=self.replication_timeout):
+                pending -= 1
+                if future.result():
+                    acks += 1
+                if acks >= self.replication_quorum:
+                    return True
+                if acks + pending < self.replication_quorum:
+                    break
+        except TimeoutError:
+            logger.error(f"Replication of {description} timed out with {acks}/{self.replication_quorum} acks")
+        return False
+    
+    def _replicate_vote(self, entry):
+        """Replicate a vote entry, through the group-commit batch when enabled"""
+        if self.batch_window <= 0:
+            return self._replicate_to_replicas("vote", entry["data"], entry)
+        
+        item = {"entry": entry, "done": threading.Event(), "result": False}
+        with self.batch_cond:
+            self.replication_batch.append(item)
+            self.batch_cond.notify()
+        
+        if not item["done"].wait(self.batch_window + self.replication_timeout + 1):
+            logger.error(f"Timed out waiting for batched replication of vote by voter {entry['data']['voter_id']}")
+        return item["result"]
+    
+    def _flush_replication_batches(self):
+        """Background thread shipping accumulated votes as ReplicateBatch calls.
+
+        A batch is sent batch_window seconds after its first vote arrives, or
+        as soon as batch_size votes have accumulated. Replicas apply a batch
+        atomically, so its quorum outcome is the outcome of every vote in it.
+        """
+        while True:
+            try:
+                with self.batch_cond:
+                    while not self.replication_batch:
+                        self.batch_cond.wait()
+                    deadline = time.monotonic() + self.batch_window
+                    while len(self.replication_batch) < self.batch_size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.batch_cond.wait(remaining)
+                    batch = self.replication_batch[:self.batch_size]
+                    del self.replication_batch[:self.batch_size]
+                
+                operations = [item["entry"] for item in batch]
+                result = False
+                try:
+                    result = self._replicate_to_quorum(f"batch of {len(batch)}", "ReplicateBatch", operations,
+                                                       self.replication_epoch)
+                finally:
+                    for item in batch:
+                        item["result"] = result
+                        item["done"].set()
+            except Exception as e:
+                logger.error(f"Error in replication batch flushing: {e}")
     
     def _process_vote_queue(self):
         """Background thread to process queued votes (priority-based).
 
         Votes are ordered by (timestamp, voter_id) so earlier clicks or lower-id voters get priority.
-        If a voter's vote is already being processed, their queued vote is requeued.
+        The thread blocks on vote_queue_cond until a vote is queued and a processing slot is
+        free. Vote admits at most one pending vote per voter, so every popped vote can be
+        dispatched straight away.
         """
         while True:
             try:
-                if self.active_votes < self.max_concurrent_votes:
-                    # Pop highest-priority vote
-                    with self.vote_queue_lock:
-                        if not self.vote_queue:
-                            time.sleep(0.1)
-                            continue
-                        _, _, _, vote_request = heapq.heappop(self.vote_queue)
-
-                    session_id = vote_request[0]
-
-                    # Lookup voter id from session
-                    with self.session_lock:
-                        voter_info = self.active_sessions.get(session_id)
-
-                    if not voter_info:
-                        # Invalid session; skip
-                        self._add_notification(f"Dropped queued vote for invalid session {session_id}")
-                        continue
-
-                    voter_id = voter_info.get("id")
-
-                    # If voter already being processed, requeue and wait
-                    with self.in_progress_lock:
-                        if voter_id in self.in_progress_votes:
-                            # requeue
-                            with self.vote_queue_lock:
-                                heapq.heappush(self.vote_queue, (vote_request[2], voter_id, self.vote_counter, vote_request))
-                                self.vote_counter += 1
-                            time.sleep(0.05)
-                            continue
-                        else:
-                            # mark as in-progress
-                            self.in_progress_votes.add(voter_id)
-
-                    # Process the vote in a separate thread
-                    vote_thread = threading.Thread(
-                        target=self._process_single_vote,
-                        args=(vote_request,),
-                        daemon=True
-                    )
-                    vote_thread.start()
-                else:
-                    time.sleep(0.1)
+                # Wait for a queued vote and a free slot, then pop highest-priority vote
+                with self.vote_queue_cond:
+                    while not self.vote_queue or self.active_votes >= self.max_concurrent_votes:
+                        self.vote_queue_cond.wait()
+                    entry = heapq.heappop(self.vote_queue)
+                voter_id, vote_request, ticket = entry[1], entry[3], entry[4]
+
+                session_id = vote_request[0]
+
+                # Session may have expired or been logged out while queued; skip
+                if not self.sessions.get(session_id):
+                    with self.vote_queue_cond:
+                        self.pending_voters.pop(voter_id, None)
+                    self._settle_vote(ticket, {"success": False, "message": "Invalid session"})
+                    self._add_notification(f"Dropped queued vote for invalid session {session_id}")
+                    continue
+
+                # Admit the vote to the worker pool. This thread is the only one that
+                # increments active_votes, so the cap checked above still holds here.
+                with self.vote_queue_cond:
+                    self.active_votes += 1
+                self.vote_executor.submit(self._run_vote, ticket, voter_id, vote_request)
             except Exception as e:
                 logger.error(f"Error in vote queue processing: {e}")
     
-    def _process_single_vote(self, vote_request):
-        """Process a single vote request"""
+    def _run_vote(self, ticket, voter_id, vote_request):
+        """Process an admitted vote and settle its receipt with the outcome"""
+        try:
+            result = self._process_single_vote(voter_id, vote_request)
+        except Exception as e:
+            logger.error(f"Error processing vote: {e}")
+            result = {"success": False, "message": "Vote processing failed"}
+        self._settle_vote(ticket, result)
+    
+    def _settle_vote(self, ticket, result):
+        """Resolve a vote's receipt, waking any Vote(..., wait=True) caller"""
+        with self.vote_queue_cond:
+            receipt = self.vote_receipts.get(ticket)
+        if receipt is not None:
+            receipt.set_result(result)
+    
+    def _new_vote_receipt(self):
+        """Issue a ticket and its unresolved receipt (caller holds vote_queue_cond)"""
+        ticket = secrets.token_urlsafe(12)
+        receipt = Future()
+        self.vote_receipts[ticket] = receipt
+        # Receipts are settled roughly in issue order; stop at the first pending one
+        while len(self.vote_receipts) > self.receipt_capacity:
+            if not next(iter(self.vote_receipts.values())).done():
+                break
+            self.vote_receipts.popitem(last=False)
+        return ticket, receipt
+    
+    def _process_single_vote(self, voter_id, vote_request):
+        """Process a single vote request admitted for voter_id"""
         session_id, candidate, timestamp, click_time = vote_request
-        # Attempt to determine voter id from session
-        with self.session_lock:
-            voter_info = self.active_sessions.get(session_id)
-
-        voter_id = None
-        if voter_info:
-            voter_id = voter_info.get("id")
-
-        # Mark active vote and increment counters
-        with self.vote_lock:
-            self.active_votes += 1
-
-        # Ensure this voter is marked in-progress (should have been marked by queue processor)
-        marked_in_progress = False
-        if voter_id is not None:
-            with self.in_progress_lock:
-                if voter_id not in self.in_progress_votes:
-                    self.in_progress_votes.add(voter_id)
-                    marked_in_progress = True
+        voter_info = self.sessions.get(session_id)
         
         try:
             # Validate session
@@ -217,16 +634,9 @@ class VotingServer:
             if self.voting_deadline and click_time > self.voting_deadline:
                 return {"success": False, "message": "Vote submitted after deadline"}
             
-            # Update Lamport clock
-            self._update_lamport_clock(timestamp)
-            
-            # Find voter in database
+            # Phase 1: find the voter and reserve the record
             with self.db_lock:
-                voter = None
-                for v in self.voters_db:
-                    if v["id"] == voter_info["id"] and v["name"] == voter_info["name"]:
-                        voter = v
-                        break
+                voter = self.voters_db.find(voter_info.name, voter_info.voter_id)
                 
                 if not voter:
                     return {"success": False, "message": "Voter not found"}
@@ -234,39 +644,46 @@ class VotingServer:
                 if voter["has_voted"]:
                     return {"success": False, "message": "Already voted"}
                 
-                # Record the vote
-                voter["has_voted"] = True
-                voter["vote"] = candidate
-                
-                # Replicate to replicas
-                replication_data = {
-                    "voter_id": voter["id"],
-                    "candidate": candidate,
-                    "timestamp": timestamp
-                }
+                if voter["id"] in self.pending_votes:
+                    return {"success": False, "message": "Vote already in progress"}
                 
-                if self._replicate_to_replicas("vote", replication_data):
-                    self._add_notification(f"{voter['name']} voted for {candidate}")
-                    return {"success": True, "message": "Vote recorded successfully"}
-                else:
-                    # Rollback if replication failed
-                    voter["has_voted"] = False
-                    voter["vote"] = None
-                    return {"success": False, "message": "Replication failed"}
+                self.pending_votes.add(voter["id"])
+            
+            # Replicate to replicas without holding db_lock
+            replication_data = {
+                "voter_id": voter["id"],
+                "candidate": candidate,
+                "timestamp": encode(timestamp)
+            }
+            entry = self._new_replication_entry("vote", replication_data)
+            replicated = False
+            try:
+                replicated = self._replicate_vote(entry)
+            finally:
+                # Phase 2: record the vote if replicated, otherwise just drop the reservation
+                with self.db_lock:
+                    self.pending_votes.discard(voter["id"])
+                    if replicated:
+                        # The vote goes in first: snapshots copy records without
+                        # db_lock and must never see has_voted without it
+                        voter["vote"] = candidate
+                        voter["has_voted"] = True
+                        self.tally[candidate] += 1
+                        log_seq = self._log_operation("vote", {"voter_id": voter["id"], "candidate": candidate})
+                self._finish_replication_entry(entry, replicated)
+            
+            if replicated:
+                self._sync_log(log_seq)
+                self._add_notification(f"{voter['name']} voted for {candidate}")
+                return {"success": True, "message": "Vote recorded successfully"}
+            return {"success": False, "message": "Replication failed"}
         
         finally:
-            # Decrement active_votes and clear in-progress marker for this voter
-            with self.vote_lock:
+            # Free the slot, let this voter queue again and wake the dispatcher
+            with self.vote_queue_cond:
                 self.active_votes -= 1
-
-            if voter_id is not None:
-                with self.in_progress_lock:
-                    if voter_id in self.in_progress_votes:
-                        # Only remove if we added it here or it's still present
-                        try:
-                            self.in_progress_votes.remove(voter_id)
-                        except KeyError:
-                            pass
+                self.pending_voters.pop(voter_id, None)
+                self.vote_queue_cond.notify()
     
     def _broadcast_time_sync(self):
         """Broadcast time synchronization to clients"""
@@ -282,109 +699,343 @@ class VotingServer:
     # RPC Methods
     def Register(self, name):
         """Register a new voter"""
-        self._increment_lamport_clock()
-        
+        # Phase 1: check the name and reserve an id
         with self.db_lock:
             # Check if voter already exists
-            for voter in self.voters_db:
-                if voter["name"] == name:
-                    return {"success": True, "id": voter["id"], "message": "Voter already registered"}
+            voter = self.voters_db.get_by_name(name)
+            if voter:
+                return {"success": True, "id": voter["id"], "message": "Voter already registered"}
             
-            # Add new voter
-            new_id = len(self.voters_db) + 1
-            new_voter = {"id": new_id, "name": name, "has_voted": False, "vote": None}
-            self.voters_db.append(new_voter)
+            if name in self.pending_registrations:
+                return {"success": False, "message": "Registration already in progress"}
             
-            # Replicate to replicas
-            if self._replicate_to_replicas("register", new_voter):
-                self._add_notification(f"New voter registered: {name} (ID: {new_id})")
-                return {"success": True, "id": new_id, "message": "Registration successful"}
-            else:
-                # Rollback
-                self.voters_db.pop()
-                return {"success": False, "message": "Registration failed due to replication error"}
+            new_id = self.voters_db.allocate_id()
+            self.pending_registrations[name] = new_id
+        
+        # Replicate to replicas without holding db_lock
+        new_voter = {"id": new_id, "name": name, "has_voted": False, "vote": None}
+        entry = self._new_replication_entry("register", new_voter)
+        replicated = False
+        try:
+            replicated = self._replicate_to_replicas("register", new_voter, entry)
+        finally:
+            # Phase 2: add the voter if replicated, otherwise release the reservation
+            with self.db_lock:
+                del self.pending_registrations[name]
+                if replicated:
+                    self.voters_db.add(new_voter)
+                    log_seq = self._log_operation("register", new_voter)
+            self._finish_replication_entry(entry, replicated)
+        
+        if replicated:
+            self._sync_log(log_seq)
+            self._add_notification(f"New voter registered: {name} (ID: {new_id})")
+            return {"success": True, "id": new_id, "message": "Registration successful"}
+        return {"success": False, "message": "Registration failed due to replication error"}
     
     def Login(self, name, voter_id):
         """Login voter and create session"""
-        self._increment_lamport_clock()
-        # Verify credentials under db_lock, then create session under session_lock
+        # Verify credentials under db_lock, then create the session outside it
         with self.db_lock:
-            voter = None
-            for v in self.voters_db:
-                if v["id"] == voter_id and v["name"] == name:
-                    voter = v
-                    break
+            voter = self.voters_db.find(name, voter_id)
 
         if not voter:
             return {"success": False, "message": "Invalid credentials"}
 
-        # Create session
-        session_id = f"session_{voter_id}_{int(time.time())}"
-        with self.session_lock:
-            self.active_sessions[session_id] = {
-                "id": voter_id,
-                "name": name,
-                "login_time": time.time()
-            }
+        # Create session with a fresh random token
+        session_id = self.sessions.create(voter_id, voter["name"])
 
         self._add_notification(f"{name} logged in")
         return {
             "success": True,
             "session_id": session_id,
             "has_voted": voter["has_voted"],
+            "expires_in": self.sessions.ttl,
             "message": "Login successful"
         }
     
+    def Logout(self, session_id):
+        """End a session; votes it queued but not yet processed are dropped"""
+        voter_info = self.sessions.remove(session_id)
+        if voter_info is None:
+            return {"success": False, "message": "Invalid session"}
+        self._add_notification(f"{voter_info.name} logged out")
+        return {"success": True, "message": "Logout successful"}
+    
+    def GetSessionStats(self):
+        """Live, expired and logged-out session counts and their approximate memory (admin function)"""
+        return {"success": True, **self.sessions.stats()}
+    
     def GetOptions(self):
         """Get list of candidates"""
         return {"success": True, "candidates": self.candidates}
     
-    def Vote(self, session_id, candidate, timestamp, click_time):
-        """Submit a vote (queued processing)"""
-        self._increment_lamport_clock()
+    def _voting_status(self):
+        """Voting phase and deadline (caller holds db_lock)"""
+        return {
+            "voting_active": self.voting_active,
+            "results_published": self.results_published,
+            "deadline": self.voting_deadline
+        }
+    
+    def GetVotingStatus(self):
+        """Get whether voting is open, results are published, and the deadline"""
+        with self.db_lock:
+            return {"success": True, **self._voting_status()}
+    
+    def GetDashboard(self, session_id=None):
+        """Everything the client dashboard renders, in one call.
+
+        Returns candidates, voting status and deadline, plus the session's
+        own voter id, name and has_voted flag when session_id is a live
+        session.
+        """
+        voter_info = self.sessions.get(session_id) if session_id else None
         
+        response = {"success": True, "candidates": self.candidates}
+        with self.db_lock:
+            response["status"] = self._voting_status()
+            voter = self.voters_db.get(voter_info.voter_id) if voter_info else None
+            if voter is not None:
+                response["voter"] = {"id": voter["id"], "name": voter["name"], "has_voted": voter["has_voted"]}
+        return response
+    
+    def Vote(self, session_id, candidate, timestamp=None, click_time=None, wait=False, timeout=None):
+        """Submit a vote (queued processing).
+
+        Without a timestamp the server stamps the vote with its hybrid
+        logical clock, so clients need no GetServerTime round trip first. A
+        client timestamp, such as a clock value from GetServerTime (a
+        decimal string), is merged into the clock and the vote is stamped
+        after it; one more than a second ahead of the clock is rejected as
+        invalid. Only votes that are queued touch the clock. The timestamp
+        used is returned either way. While a voter has a vote queued or
+        being processed, further votes from them are rejected as already
+        pending.
+
+        Every queued vote gets a ticket for GetVoteReceipt. With wait=True
+        the call blocks until the vote is committed or rejected, for at most
+        timeout seconds (capped at max_vote_wait), and returns the outcome;
+        if it is still pending by then the queued response is returned.
+        Each waiting call holds one RPC worker thread.
+        """
         # Validate candidate
         if candidate not in self.candidates:
             return {"success": False, "message": "Invalid candidate"}
-        # Prepare vote request
-        vote_request = (session_id, candidate, timestamp, click_time)
+        if timestamp is not None:
+            try:
+                timestamp = decode(timestamp)
+            except (TypeError, ValueError, OverflowError):
+                return {"success": False, "message": "Invalid timestamp"}
+        # Without a click time the vote counts as cast now
+        if click_time is None:
+            click_time = time.time()
 
         # Resolve voter id for priority ordering
-        with self.session_lock:
-            voter_info = self.active_sessions.get(session_id)
+        voter_info = self.sessions.get(session_id)
 
         if not voter_info:
             return {"success": False, "message": "Invalid session"}
 
-        voter_id = voter_info.get("id")
+        voter_id = voter_info.voter_id
 
-        # Push into priority heap
-        with self.vote_queue_lock:
-            heapq.heappush(self.vote_queue, (timestamp, voter_id, self.vote_counter, vote_request))
+        # Push into priority heap and wake the dispatcher; the voter's first
+        # pending vote wins and later ones are answered straight away
+        with self.vote_queue_cond:
+            pending_ticket = self.pending_voters.get(voter_id)
+            if pending_ticket is not None:
+                self.duplicate_votes += 1
+                return {"success": False, "message": "Vote already pending", "pending": True,
+                        "ticket": pending_ticket}
+            # Stamped only now, so rejected calls never advance the clock
+            try:
+                timestamp = self.clock.tick() if timestamp is None else self.clock.update(timestamp)
+            except ValueError:
+                return {"success": False, "message": "Invalid timestamp"}
+            vote_request = (session_id, candidate, timestamp, click_time)
+            ticket, receipt = self._new_vote_receipt()
+            self.pending_voters[voter_id] = ticket
+            heapq.heappush(self.vote_queue, (timestamp, voter_id, self.vote_counter, vote_request, ticket))
             self.vote_counter += 1
             queue_size = len(self.vote_queue)
+            self.vote_queue_cond.notify()
 
         self._add_notification(f"Vote request queued (queue size: {queue_size})")
 
-        return {"success": True, "message": "Vote queued for processing", "queued": True}
+        response = {"success": True, "message": "Vote queued for processing", "queued": True,
+                    "timestamp": encode(timestamp), "ticket": ticket}
+        if not wait:
+            return response
+        
+        wait_time = self.max_vote_wait if timeout is None else min(timeout, self.max_vote_wait)
+        try:
+            result = receipt.result(timeout=max(wait_time, 0))
+        except TimeoutError:
+            return response
+        return dict(result, timestamp=encode(timestamp), ticket=ticket)
+    
+    def GetVoteReceipt(self, ticket):
+        """Outcome of a queued vote: done is false while pending, then result holds it"""
+        with self.vote_queue_cond:
+            receipt = self.vote_receipts.get(ticket)
+        if receipt is None:
+            return {"success": False, "message": "Unknown or expired ticket"}
+        if not receipt.done():
+            return {"success": True, "ticket": ticket, "done": False}
+        return {"success": True, "ticket": ticket, "done": True, "result": receipt.result()}
+    
+    def GetQueueStatus(self):
+        """Get vote queue depth and worker pool utilisation (admin function)"""
+        with self.vote_queue_cond:
+            queued = len(self.vote_queue)
+            active = self.active_votes
+            pending_voters = len(self.pending_voters)
+            duplicates = self.duplicate_votes
+        return {
+            "success": True,
+            "queued": queued,
+            "active": active,
+            "pending_voters": pending_voters,
+            "duplicates_rejected": duplicates,
+            "max_concurrent_votes": self.max_concurrent_votes
+        }
+    
+    def FetchLogSince(self, epoch, seq, max_items=1000):
+        """Replicated operations after seq, for replica catch-up.
+
+        Only settled operations are returned, so a replica never applies a
+        vote the primary may still abort. Returns resync=True when the
+        replica is on another epoch or seq is older than the retained log;
+        it must then call FetchSnapshot.
+        """
+        with self.replication_log_lock:
+            oldest = self.replication_log[0]["seq"] if self.replication_log else self.replication_seq + 1
+            if epoch != self.replication_epoch or seq + 1 < oldest or seq > self.replication_seq:
+                return {"success": True, "resync": True, "epoch": self.replication_epoch}
+            if self.replication_inflight:
+                last_seq = min(self.replication_inflight) - 1
+            else:
+                last_seq = self.replication_seq
+            start = seq + 1 - oldest
+            count = max(0, min(max_items, last_seq - seq))
+            entries = [dict(entry) for entry in itertools.islice(self.replication_log, start, start + count)]
+        return {
+            "success": True,
+            "resync": False,
+            "epoch": self.replication_epoch,
+            "entries": entries,
+            "last_seq": last_seq
+        }
+    
+    def FetchSnapshot(self):
+        """Full voter state plus the replication position it reflects.
+
+        Operations still in flight are not in the snapshot, so the position
+        is set just before the oldest of them and catch-up re-fetches them.
+        The clock stamp of the operation at that position is included when
+        it is still in the log. Only the position is taken under db_lock;
+        the voters are copied after it is released, and replicas replay
+        operations already reflected in them idempotently.
+        """
+        clock = None
+        with self.db_lock:
+            with self.replication_log_lock:
+                if self.replication_inflight:
+                    seq = min(self.replication_inflight) - 1
+                else:
+                    seq = self.replication_seq
+                if self.replication_log and seq >= self.replication_log[0]["seq"]:
+                    clock = self.replication_log[seq - self.replication_log[0]["seq"]]["clock"]
+            boundary = self._snapshot_boundary()
+        state = self._snapshot_state(boundary)
+        return {"success": True, "epoch": self.replication_epoch, "seq": seq, "clock": clock, "state": state}
     
     def GetServerTime(self):
-        """Get current server time"""
-        return {"success": True, "server_time": time.time(), "lamport_clock": self.lamport_clock}
+        """Get current server time and the latest clock stamp, read without locking"""
+        return {"success": True, "server_time": time.time(), "clock": encode(self.clock.last)}
+    
+    def StreamNotifications(self, since_seq=None, max_items=100, timeout=0):
+        """Get notifications newer than since_seq.
+
+        Without since_seq every retained notification is returned, as before.
+        With a cursor only the delta is returned, oldest first and at most
+        max_items; pass the returned next_seq as since_seq on the next call.
+        A positive timeout long-polls until something new arrives (capped at
+        30 seconds). `missed` is true when older entries were evicted before
+        being read, or when since_seq is from before a server restart; the
+        retained history is then returned from the start.
+        """
+        notifications, next_seq, missed = self.notifications.read_since(since_seq, max_items, timeout)
+        response = {"success": True, "notifications": notifications, "next_seq": next_seq}
+        if since_seq is not None:
+            response["missed"] = missed
+        return response
+    
+    def SubscribeNotifications(self, name=None, capacity=0):
+        """Open a notification subscription with its own bounded queue.
+
+        When the queue is full the oldest entry is dropped; the subscriber is
+        told how many it lost on its next poll. Subscriptions that go
+        unpolled for five minutes are closed.
+        """
+        subscriber_id = self.notifications.subscribe(name, capacity or None)
+        return {"success": True, "subscriber_id": subscriber_id}
+    
+    def PollNotifications(self, subscriber_id, max_items=100, timeout=0):
+        """Drain up to max_items queued notifications, long-polling up to timeout seconds"""
+        result = self.notifications.poll(subscriber_id, max_items, timeout)
+        if result is None:
+            return {"success": False, "message": "Unknown or expired subscription"}
+        notifications, dropped = result
+        return {"success": True, "notifications": notifications, "dropped": dropped}
     
-    def StreamNotifications(self):
-        """Get recent notifications"""
-        with self.notification_lock:
-            return {"success": True, "notifications": list(self.notifications)}
+    def UnsubscribeNotifications(self, subscriber_id):
+        """Close a notification subscription"""
+        if not self.notifications.unsubscribe(subscriber_id):
+            return {"success": False, "message": "Unknown or expired subscription"}
+        return {"success": True}
     
-    def GetVoterDatabase(self):
-        """Get current voter database (admin function)"""
+    def GetNotificationMetrics(self):
+        """Per-subscriber lag and drop counts for the notification bus"""
+        return {"success": True, **self.notifications.metrics()}
+    
+    def GetVoterDatabase(self, query=None):
+        """Get voter records (admin function).
+
+        Without a query every record is returned. A query dict returns one
+        page in id order, filtered by start_id/end_id, has_voted and
+        name_prefix, projected onto `fields`, at most `limit` records
+        (default 100, max 1000). Pass the returned next_id as start_id to
+        fetch the next page; it is absent once the range is exhausted.
+        """
+        if query is None:
+            with self.db_lock:
+                return {"success": True, "voters": self.voters_db.records()}
+        try:
+            query_args = voter_query_args(query)
+        except (TypeError, ValueError) as e:
+            return {"success": False, "message": str(e)}
         with self.db_lock:
-            return {"success": True, "voters": self.voters_db.copy()}
+            voters, next_id = self.voters_db.query(**query_args)
+        response = {"success": True, "voters": voters}
+        if next_id is not None:
+            response["next_id"] = next_id
+        return response
+    
+    def GetVoterStatus(self, voter_id):
+        """Point lookup of one voter's id, name and has_voted flag"""
+        with self.db_lock:
+            voter = self.voters_db.get(voter_id)
+            if voter is None:
+                return {"success": False, "message": "Voter not found"}
+            return {"success": True, "id": voter["id"], "name": voter["name"], "has_voted": voter["has_voted"]}
     
     def SetTimer(self, end_time):
         """Set voting deadline (admin function)"""
-        self.voting_deadline = end_time
+        with self.db_lock:
+            self.voting_deadline = end_time
+            log_seq = self._log_operation("set_timer", {"end_time": end_time})
+        self._sync_log(log_seq)
         self._add_notification(f"Voting deadline set to {datetime.fromtimestamp(end_time)}")
         
         # Replicate to replicas
@@ -393,8 +1044,11 @@ class VotingServer:
     
     def StartVote(self):
         """Start voting (admin function)"""
-        self.voting_active = True
-        self.results_published = False
+        with self.db_lock:
+            self.voting_active = True
+            self.results_published = False
+            log_seq = self._log_operation("start_vote", {})
+        self._sync_log(log_seq)
         self._add_notification("Voting started")
         
         # Replicate to replicas
@@ -403,55 +1057,163 @@ class VotingServer:
     
     def StopVote(self):
         """Stop voting (admin function)"""
-        self.voting_active = False
+        with self.db_lock:
+            self.voting_active = False
+            log_seq = self._log_operation("stop_vote", {})
+        self._sync_log(log_seq)
         self._add_notification("Voting stopped")
         
         # Replicate to replicas
         self._replicate_to_replicas("stop_vote", {})
         return {"success": True, "message": "Voting stopped"}
     
+    def _tally_response(self):
+        """Current counts, winner and total (caller holds db_lock)"""
+        results = dict(self.tally)
+        total_votes = sum(results.values())
+        winner = None
+        if total_votes:
+            winner = max(results.items(), key=lambda item: item[1])[0]
+        return {"success": True, "results": results, "winner": winner, "total_votes": total_votes}
+    
+    def GetTally(self):
+        """Get per-candidate vote counts (admin function)"""
+        with self.db_lock:
+            return self._tally_response()
+    
     def PublishResults(self):
         """Publish results to tally server (admin function)"""
         if self.voting_active:
             return {"success": False, "message": "Cannot publish results while voting is active"}
         
-        # Collect votes
-        votes = []
+        # Counters are maintained at commit time, so this is O(candidates)
         with self.db_lock:
-            for voter in self.voters_db:
-                if voter["has_voted"] and voter["vote"]:
-                    votes.append(voter["vote"])
+            self.results_published = True
+            response = self._tally_response()
+            log_seq = self._log_operation("publish_results", {})
+        self._sync_log(log_seq)
+        
+        if response["winner"]:
+            winner_msg = f"Winner: {response['winner']} with {response['results'][response['winner']]} votes"
+        else:
+            winner_msg = "No votes cast"
+        self._add_notification(f"Results published - {winner_msg}")
         
+        # Replicate to replicas
+        self._replicate_to_replicas("publish_results", {})
+        response["message"] = "Results published successfully"
+        return response
+
+
+def parse_args(argv=None):
+    """Parse server command-line options"""
+    parser = argparse.ArgumentParser(description="Distributed Voting System - Main Server")
+    parser.add_argument("--port", type=int, default=8000, help="RPC port (default: 8000)")
+    parser.add_argument("--mode", choices=["single", "threaded"], default="threaded",
+                        help="serve requests one at a time or on a worker pool (default: threaded)")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="worker threads in threaded mode (default: 8)")
+    parser.add_argument("--keep-alive", type=float, default=0,
+                        help="seconds an idle client connection is kept open for reuse; each open "
+                             "connection holds a worker thread (default: 0, close after every call)")
+    parser.add_argument("--vote-workers", type=int, default=5,
+                        help="votes processed concurrently (default: 5)")
+    parser.add_argument("--quorum", type=int, default=None,
+                        help="replica acks required to commit (default: majority with primary)")
+    parser.add_argument("--replication-timeout", type=float, default=2.0,
+                        help="seconds to wait for the replica quorum (default: 2.0)")
+    parser.add_argument("--batch-window", type=float, default=0.0,
+                        help="seconds to accumulate votes into one replication batch (default: 0, off)")
+    parser.add_argument("--batch-size", type=int, default=64,
+                        help="votes that trigger an immediate batch flush (default: 64)")
+    parser.add_argument("--data-dir", default=None,
+                        help="directory for the write-ahead log and snapshots (default: in-memory only)")
+    parser.add_argument("--fsync", choices=["op", "group", "interval"], default="group",
+                        help="WAL fsync policy (default: group)")
+    parser.add_argument("--snapshot-every", type=int, default=10000,
+                        help="logged operations between snapshots (default: 10000)")
+    parser.add_argument("--session-ttl", type=float, default=3600.0,
+                        help="seconds a login session stays valid (default: 3600)")
+    parser.add_argument("--check-tally", action="store_true",
+                        help="recover state from --data-dir, reconcile vote counters against voter records and exit")
+    parser.add_argument("--log-level", choices=["DEBUG", "INFO", "WARNING", "ERROR"], default="INFO",
+                        help="minimum level written to the log (default: INFO)")
+    return parser.parse_args(argv)
 
+def check_tally(data_dir):
+    """Offline consistency check of the recovered vote counters; returns an exit status"""
+    if not data_dir:
+        print("--check-tally needs --data-dir")
+        return 2
+    
+    server = VotingServer(replica_ports=[], data_dir=data_dir)
+    with server.db_lock:
+        mismatches = reconcile_tally(server.voters_db, server.candidates, server.tally)
+        total = sum(server.tally.values())
+    
+    if not mismatches:
+        print(f"Tally consistent: {total} votes across {len(server.candidates)} candidates")
+        return 0
+    for candidate, (counter, actual) in mismatches.items():
+        print(f"Mismatch for {candidate}: counter {counter}, voter records {actual}")
+    return 1
 
 def main():
     """Start the voting server"""
-    server = VotingServer()
+    args = parse_args()
+    # Log records are written by a background listener, never on the calling thread
+    configure_logging(args.log_level)
+    if args.check_tally:
+        sys.exit(check_tally(args.data_dir))
+    server = VotingServer(port=args.port, max_concurrent_votes=args.vote_workers,
+                          replication_quorum=args.quorum,
+                          replication_timeout=args.replication_timeout,
+                          batch_window=args.batch_window, batch_size=args.batch_size,
+                          data_dir=args.data_dir, fsync_policy=args.fsync,
+                          snapshot_every=args.snapshot_every, session_ttl=args.session_ttl)
     
     # Create XML-RPC server
-    rpc_server = SimpleXMLRPCServer(("localhost", 8000), allow_none=True)
+    rpc_server = create_rpc_server("localhost", args.port, args.mode, args.workers, args.keep_alive)
     rpc_server.register_instance(server)
     
-    print("Voting Server starting on port 8000...")
+    if args.mode == "threaded":
+        print(f"Voting Server starting on port {args.port} ({args.workers} worker threads)...")
+    else:
+        print(f"Voting Server starting on port {args.port} (single-threaded)...")
     print("Available RPC methods:")
     print("- Register(name)")
     print("- Login(name, id)")
+    print("- Logout(session_id)")
+    print("- GetSessionStats()")
     print("- GetOptions()")
-    print("- Vote(session_id, candidate, timestamp, click_time)")
+    print("- GetDashboard(session_id)")
+    print("- Vote(session_id, candidate, [timestamp], [click_time], [wait], [timeout])")
+    print("- GetVoteReceipt(ticket)")
     print("- GetServerTime()")
-    print("- StreamNotifications()")
-    print("- GetVoterDatabase()")
+    print("- FetchLogSince(epoch, seq, max_items)")
+    print("- FetchSnapshot()")
+    print("- GetQueueStatus()")
+    print("- StreamNotifications(since_seq, max_items, timeout)")
+    print("- SubscribeNotifications(name, capacity)")
+    print("- PollNotifications(subscriber_id, max_items, timeout)")
+    print("- UnsubscribeNotifications(subscriber_id)")
+    print("- GetNotificationMetrics()")
+    print("- GetVoterDatabase(query)")
+    print("- GetVoterStatus(voter_id)")
     print("- SetTimer(end_time)")
     print("- StartVote()")
     print("- StopVote()")
     print("- PublishResults()")
+    print("- GetTally()")
     print("- GetVotingStatus()")
+    print("- system.multicall(calls)")
     
     try:
         rpc_server.serve_forever()
     except KeyboardInterrupt:
         print("\nShutting down server...")
         rpc_server.shutdown()
+        rpc_server.server_close()
 
 if __name__ == "__main__":
     main()
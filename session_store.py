@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - Session Store
+Lock-striped login sessions with unguessable tokens and heap-driven TTL expiry
+"""
+
+import heapq
+import logging
+import secrets
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+TOKEN_BYTES = 16
+
+
+class Session:
+    """One live login; kept small because millions may be held at once"""
+
+    __slots__ = ("voter_id", "name", "expires_at")
+
+    def __init__(self, voter_id, name, expires_at):
+        self.voter_id = voter_id
+        self.name = name
+        self.expires_at = expires_at
+
+
+class _SessionShard:
+    """One lock's worth of the session table and its expiry heap"""
+
+    def __init__(self):
+        self.sessions = {}
+        self.expiry_heap = []
+        self.lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.logged_out = 0
+
+
+class SessionStore:
+    """Login sessions keyed by random token, each expiring ttl seconds after login.
+
+    The table is split into `shards` independently locked shards chosen by
+    token hash, so logins, logouts and expiry in different shards never
+    wait on each other. Lookups take no lock at all: a single dict read is
+    atomic, and the deadline is checked on the session itself.
+
+    Expiry is driven by a per-shard min-heap of (expires_at, token): the
+    reaper only ever looks at heap tops, so it costs O(log n) per expired
+    session rather than a sweep over every live one. Entries for sessions
+    that were logged out stay in the heap and are skipped when they
+    surface. Because lookups check the deadline, a session is invalid the
+    moment it expires even if the reaper has not reached it yet.
+    """
+
+    def __init__(self, ttl=3600.0, shards=16, reap_batch=10000):
+        self.ttl = ttl
+        self.reap_batch = reap_batch
+        self._shards = [_SessionShard() for _ in range(shards)]
+
+        reaper = threading.Thread(target=self._reap_periodically, daemon=True)
+        reaper.start()
+
+    def _shard(self, token):
+        return self._shards[hash(token) % len(self._shards)]
+
+    def __len__(self):
+        return sum(len(shard.sessions) for shard in self._shards)
+
+    def create(self, voter_id, name):
+        """Start a session and return its token"""
+        expires_at = time.time() + self.ttl
+        session = Session(voter_id, name, expires_at)
+        while True:
+            token = secrets.token_urlsafe(TOKEN_BYTES)
+            shard = self._shard(token)
+            with shard.lock:
+                if token in shard.sessions:
+                    continue
+                shard.sessions[token] = session
+                heapq.heappush(shard.expiry_heap, (expires_at, token))
+                shard.created += 1
+            return token
+
+    def get(self, token):
+        """The live session for a token, or None if unknown or expired"""
+        session = self._shard(token).sessions.get(token)
+        if session is None or session.expires_at <= time.time():
+            return None
+        return session
+
+    def remove(self, token):
+        """End a session; returns it, or None if it was unknown or already gone"""
+        shard = self._shard(token)
+        with shard.lock:
+            session = shard.sessions.pop(token, None)
+            if session is not None:
+                shard.logged_out += 1
+        return session
+
+    # Expiry
+
+    def expire(self, now=None):
+        """Drop sessions whose deadline has passed; returns how many were removed"""
+        now = time.time() if now is None else now
+        return sum(self._expire_shard(shard, now) for shard in self._shards)
+
+    def _expire_shard(self, shard, now):
+        # Works through the heap in batches of reap_batch, releasing the lock
+        # between batches so a mass expiry does not stall logins in the shard
+        removed = 0
+        while True:
+            with shard.lock:
+                for _ in range(self.reap_batch):
+                    if not shard.expiry_heap or shard.expiry_heap[0][0] > now:
+                        shard.expired += removed
+                        return removed
+                    expires_at, token = heapq.heappop(shard.expiry_heap)
+                    session = shard.sessions.get(token)
+                    if session is not None and session.expires_at == expires_at:
+                        del shard.sessions[token]
+                        removed += 1
+
+    def _next_expiry(self):
+        # Reading a heap top without the lock is safe enough for scheduling
+        # the reaper; a stale value only makes it wake early or late once
+        tops = []
+        for shard in self._shards:
+            try:
+                tops.append(shard.expiry_heap[0][0])
+            except IndexError:
+                continue
+        return min(tops) if tops else None
+
+    def _reap_periodically(self):
+        while True:
+            next_expiry = self._next_expiry()
+            delay = 1.0 if next_expiry is None else next_expiry - time.time()
+            # Wake at the next deadline, but at least once a second
+            time.sleep(min(max(delay, 0.01), 1.0))
+            try:
+                removed = self.expire()
+                if removed:
+                    logger.info(f"Expired {removed} sessions")
+            except Exception as e:
+                logger.error(f"Error expiring sessions: {e}")
+
+    # Accounting
+
+    def stats(self):
+        """Session counters and an estimate of the memory they hold.
+
+        The estimate adds the dict and heap tables to the per-session cost
+        of a Session object, its expiry float, its token string and its heap
+        tuple; voter names are shared with the voter records and not counted.
+        """
+        live = heap_entries = table_bytes = 0
+        created = expired = logged_out = 0
+        for shard in self._shards:
+            with shard.lock:
+                live += len(shard.sessions)
+                heap_entries += len(shard.expiry_heap)
+                table_bytes += sys.getsizeof(shard.sessions) + sys.getsizeof(shard.expiry_heap)
+                created += shard.created
+                expired += shard.expired
+                logged_out += shard.logged_out
+        token_bytes = sys.getsizeof(secrets.token_urlsafe(TOKEN_BYTES))
+        session_bytes = sys.getsizeof(Session(0, "", 0.0)) + sys.getsizeof(0.0) + token_bytes
+        entry_bytes = sys.getsizeof((0.0, ""))
+        return {
+            "live": live,
+            "shards": len(self._shards),
+            "created": created,
+            "expired": expired,
+            "logged_out": logged_out,
+            "heap_entries": heap_entries,
+            "approx_bytes": table_bytes + live * session_bytes + heap_entries * entry_bytes,
+        }
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Quorum replication against a deliberately slow stand-in replica
+Starts one healthy and one hung replica in this process, as benchmark_logging.py does
+
+    python -m pytest -q test_replication.py
+"""
+
+import threading
+import time
+
+import pytest
+
+from local_cluster import free_port
+from replica import ReplicaServer, ThreadedXMLRPCServer
+from rpc_transport import KeepAliveRequestHandler
+from server import VotingServer
+
+SLOW_REPLICA_DELAY = 5.0
+
+class SlowReplica(ReplicaServer):
+    """Replica that sleeps before handling every replication call"""
+
+    def ReplicateUpdate(self, *args):
+        time.sleep(SLOW_REPLICA_DELAY)
+        return super().ReplicateUpdate(*args)
+
+    def ReplicateBatch(self, *args):
+        time.sleep(SLOW_REPLICA_DELAY)
+        return super().ReplicateBatch(*args)
+
+def start_replica(replica_class):
+    port = free_port()
+    replica = replica_class(port, primary_url=None)
+    rpc_server = ThreadedXMLRPCServer(("localhost", port), requestHandler=KeepAliveRequestHandler,
+                                      allow_none=True, logRequests=False)
+    rpc_server.register_instance(replica)
+    threading.Thread(target=rpc_server.serve_forever, daemon=True).start()
+    return replica, port
+
+@pytest.fixture(scope="module")
+def replicas():
+    return start_replica(ReplicaServer), start_replica(SlowReplica)
+
+@pytest.fixture(scope="module")
+def replica_ports(replicas):
+    return [port for _, port in replicas]
+
+def follow(replicas, primary):
+    """Resync replicas from the primary's snapshot, as their first catch-up would"""
+    for replica, _ in replicas:
+        replica._resync_from_snapshot(primary)
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_replica_off_the_primary_epoch_does_not_ack(replicas, replica_ports):
+    # A replica that has not caught up with this primary cannot stage its
+    # operations, so it must not count towards the quorum
+    (healthy, _), _ = replicas
+    primary = VotingServer(port=free_port(), replica_ports=list(replica_ports),
+                           replication_quorum=1, replication_timeout=0.5)
+    healthy.catchup_requested.clear()
+    result = primary.Register("off-epoch-voter")
+    assert not result["success"]
+    assert healthy.voters_db.get_by_name("off-epoch-voter") is None
+    assert healthy.needs_resync
+    assert healthy.catchup_requested.is_set()
+
+def test_quorum_returns_without_waiting_for_slow_replica(replicas, replica_ports):
+    primary = VotingServer(port=free_port(), replica_ports=list(replica_ports),
+                           replication_quorum=1, replication_timeout=1.0)
+    follow(replicas, primary)
+    start = time.perf_counter()
+    result = primary.Register("quorum-voter")
+    elapsed = time.perf_counter() - start
+    assert result["success"]
+    assert elapsed < 0.5
+
+def test_slow_replica_does_not_starve_healthy_one(replicas, replica_ports):
+    # Registrations arrive at about 50 a second regardless of how fast earlier
+    # ones finish, so calls to the slow replica pile up far beyond what it can
+    # have in flight; that must not hold up the healthy replica's acks
+    primary = VotingServer(port=free_port(), replica_ports=list(replica_ports),
+                           replication_quorum=1, replication_timeout=2.0)
+    follow(replicas, primary)
+    results = []
+
+    def register(i):
+        results.append(primary.Register(f"steady-voter-{i}"))
+
+    clients = []
+    for i in range(100):
+        client = threading.Thread(target=register, args=(i,))
+        client.start()
+        clients.append(client)
+        time.sleep(0.02)
+    for client in clients:
+        client.join()
+    assert [result["message"] for result in results if not result["success"]] == []
+
+def test_quorum_unreachable_without_the_slow_replica(replicas, replica_ports):
+    primary = VotingServer(port=free_port(), replica_ports=list(replica_ports),
+                           replication_quorum=2, replication_timeout=0.5)
+    follow(replicas, primary)
+    start = time.perf_counter()
+    result = primary.Register("majority-voter")
+    assert not result["success"]
+    assert time.perf_counter() - start < SLOW_REPLICA_DELAY
+
+def test_replica_applies_only_committed_operations(replicas, replica_ports):
+    # The healthy replica acks every registration; with quorum=2 the slow one
+    # makes the primary abort, so the healthy replica must not keep it
+    (healthy, _), _ = replicas
+    primary = VotingServer(port=free_port(), replica_ports=list(replica_ports),
+                           replication_quorum=2, replication_timeout=0.5)
+    follow(replicas, primary)
+    aborted = primary.Register("aborted-voter")
+    assert not aborted["success"]
+
+    primary.replication_quorum = 1
+    committed = primary.Register("committed-voter")
+    assert committed["success"]
+    assert wait_for(lambda: healthy.voters_db.get_by_name("committed-voter") is not None)
+    assert healthy.voters_db.get_by_name("aborted-voter") is None
+    assert healthy.GetReplicaStatus()["staged"] == 0
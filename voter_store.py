@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - Voter Store
+In-memory voter records with constant-time lookup by id and by name
+"""
+
+DEFAULT_VOTER_NAMES = [
+    "Alice", "Bob", "Charlie", "Diana", "Eve",
+    "Frank", "Grace", "Henry", "Ivy", "Jack"
+]
+
+VOTER_FIELDS = ("id", "name", "has_voted", "vote")
+MAX_PAGE_SIZE = 1000
+
+
+def default_voters():
+    """Build fresh records for the pre-registered voters"""
+    return [
+        {"id": i, "name": name, "has_voted": False, "vote": None}
+        for i, name in enumerate(DEFAULT_VOTER_NAMES, start=1)
+    ]
+
+
+def voter_query_args(query):
+    """Validate an RPC voter query dict and turn it into VoterStore.query arguments.
+
+    Recognised keys: start_id, end_id, has_voted, name_prefix, fields and
+    limit (capped at MAX_PAGE_SIZE). Raises ValueError on anything else.
+    """
+    unknown = set(query) - {"start_id", "end_id", "has_voted", "name_prefix", "fields", "limit"}
+    if unknown:
+        raise ValueError(f"Unknown query keys: {', '.join(sorted(unknown))}")
+    fields = query.get("fields")
+    if fields is not None:
+        bad_fields = [field for field in fields if field not in VOTER_FIELDS]
+        if bad_fields:
+            raise ValueError(f"Unknown voter fields: {', '.join(bad_fields)}")
+    limit = query.get("limit", 100)
+    if not isinstance(limit, int) or limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return {
+        "start_id": query.get("start_id", 1),
+        "end_id": query.get("end_id"),
+        "has_voted": query.get("has_voted"),
+        "name_prefix": query.get("name_prefix"),
+        "fields": fields,
+        "limit": min(limit, MAX_PAGE_SIZE),
+    }
+
+
+class VoterStore:
+    """Voter records indexed by id and by name.
+
+    The store does no locking of its own; callers keep guarding it with
+    their existing db_lock exactly as they did the plain list.
+    Iteration yields records in registration order.
+    """
+
+    def __init__(self, voters=None):
+        self._by_id = {}
+        self._by_name = {}
+        self._next_id = 1
+        for voter in voters or []:
+            self.add(voter)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        return iter(list(self._by_id.values()))
+
+    def __contains__(self, voter_id):
+        return voter_id in self._by_id
+
+    def add(self, voter):
+        """Insert a voter record; returns False if the id is already taken"""
+        if voter["id"] in self._by_id:
+            return False
+        self._by_id[voter["id"]] = voter
+        self._by_name.setdefault(voter["name"], voter)
+        self._next_id = max(self._next_id, voter["id"] + 1)
+        return True
+
+    def get(self, voter_id):
+        """Look up a voter by id"""
+        return self._by_id.get(voter_id)
+
+    def get_by_name(self, name):
+        """Look up a voter by name"""
+        return self._by_name.get(name)
+
+    def find(self, name, voter_id):
+        """Look up a voter whose id and name both match"""
+        voter = self._by_id.get(voter_id)
+        if voter is not None and voter["name"] == name:
+            return voter
+        return None
+
+    def allocate_id(self):
+        """Reserve a fresh id for a voter that is about to be registered.
+
+        Ids are never handed out twice, even if the registration that
+        reserved one is abandoned before its record is added.
+        """
+        voter_id = self._next_id
+        self._next_id += 1
+        return voter_id
+
+    def records(self):
+        """Shallow copy of every record, in registration order"""
+        return list(self._by_id.values())
+
+    def query(self, start_id=1, end_id=None, has_voted=None, name_prefix=None, fields=None,
+              limit=100, max_scan=10000):
+        """One page of records matching the filters, in id order.
+
+        Walks ids from start_id to end_id (inclusive) rather than the whole
+        store, examining at most max_scan ids so a sparse filter cannot hold
+        the caller's lock for long. Returns (records, next_id); next_id is
+        where the following page starts, or None once the range is done.
+        fields projects each record onto the named keys.
+        """
+        stop = self._next_id if end_id is None else min(end_id + 1, self._next_id)
+        voter_id = max(start_id, 1)
+        page = []
+        scanned = 0
+        while voter_id < stop and len(page) < limit and scanned < max_scan:
+            voter = self._by_id.get(voter_id)
+            voter_id += 1
+            scanned += 1
+            if voter is None:
+                continue
+            if has_voted is not None and voter["has_voted"] != has_voted:
+                continue
+            if name_prefix and not voter["name"].startswith(name_prefix):
+                continue
+            if fields:
+                page.append({field: voter[field] for field in fields if field in voter})
+            else:
+                page.append(dict(voter))
+        return page, (voter_id if voter_id < stop else None)
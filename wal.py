@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Distributed Voting System - Write-Ahead Log
+Append-only operation log with compact snapshots for crash recovery
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("op", "group", "interval")
+
+
+class WriteAheadLog:
+    """Durable, append-only log of state-changing operations.
+
+    Records are JSON lines {"seq": n, "op": ..., "data": ...} written to
+    segment files named after their first sequence number. A snapshot
+    captures the full state as of some sequence number; segments it
+    covers are deleted, so recovery loads the snapshot and replays only
+    the tail.
+
+    fsync policies:
+      op       - fsync inside every append
+      group    - append only writes; sync(seq) fsyncs once for every
+                 record appended so far, so concurrent committers share it
+      interval - a background thread fsyncs every fsync_interval seconds
+    """
+
+    SNAPSHOT_FILE = "snapshot.json"
+
+    def __init__(self, directory, fsync_policy="group", fsync_interval=1.0, snapshot_every=10000):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.directory = directory
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.snapshot_every = snapshot_every
+        os.makedirs(directory, exist_ok=True)
+
+        self._write_lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self.snapshot_seq = self._read_snapshot_seq()
+        # Only the last record written can be torn; it sits in the newest
+        # non-empty segment, since a restart may have opened an empty one
+        for _, path in reversed(self._segments()):
+            if os.path.getsize(path):
+                self._truncate_torn_tail(path)
+                break
+        self.last_seq = self._scan_last_seq()
+        self.synced_seq = self.last_seq
+        self._segment = None
+        self._closed = False
+        self._open_segment(self.last_seq + 1)
+
+        if fsync_policy == "interval":
+            sync_thread = threading.Thread(target=self._sync_periodically, daemon=True)
+            sync_thread.start()
+
+    # Segments
+
+    def _segment_path(self, start_seq):
+        return os.path.join(self.directory, f"wal-{start_seq:020d}.log")
+
+    def _segments(self):
+        """(start_seq, path) for every segment, oldest first"""
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith("wal-") and name.endswith(".log"):
+                segments.append((int(name[4:-4]), os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _open_segment(self, start_seq):
+        if self._segment is not None:
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._segment.close()
+        self._segment = open(self._segment_path(start_seq), "a", encoding="utf-8")
+
+    def _truncate_torn_tail(self, path):
+        """Cut a record left partial by a crash mid-append off the end of a segment.
+
+        Appends may reopen the segment, so a torn line left in place would
+        be glued to the next record and end replay there.
+        """
+        with open(path, "rb+") as segment:
+            size = segment.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = self._line_start(segment, end)
+                segment.seek(start)
+                line = segment.read(end - start)
+                if line.endswith(b"\n"):
+                    try:
+                        json.loads(line)
+                        break
+                    except ValueError:
+                        pass
+                end = start
+            if end < size:
+                logger.warning(f"Truncating {size - end} bytes of torn WAL records from {path}")
+                segment.truncate(end)
+                segment.flush()
+                os.fsync(segment.fileno())
+
+    @staticmethod
+    def _line_start(segment, end, chunk_size=4096):
+        """Offset of the start of the line ending at byte offset end"""
+        position = end - 1  # skip the line's own newline
+        while position > 0:
+            chunk_start = max(0, position - chunk_size)
+            segment.seek(chunk_start)
+            newline = segment.read(position - chunk_start).rfind(b"\n")
+            if newline >= 0:
+                return chunk_start + newline + 1
+            position = chunk_start
+        return 0
+
+    def _scan_last_seq(self):
+        """Seq of the last intact record, parsing only the tail of the newest segment"""
+        for _, path in reversed(self._segments()):
+            tail = deque(maxlen=2)
+            with open(path, "r", encoding="utf-8") as segment:
+                tail.extend(segment)
+            for line in reversed(tail):
+                try:
+                    return max(self.snapshot_seq, json.loads(line)["seq"])
+                except ValueError:
+                    continue
+        return self.snapshot_seq
+
+    # Appending
+
+    def append(self, op, data, source_seq=None):
+        """Append one operation and return its sequence number.
+
+        source_seq records the primary's replication sequence number for
+        operations a replica applied, so it can resume catch-up after a restart.
+        """
+        record = {"op": op, "data": data}
+        if source_seq is not None:
+            record["source_seq"] = source_seq
+        with self._write_lock:
+            self.last_seq += 1
+            seq = self.last_seq
+            record["seq"] = seq
+            self._segment.write(json.dumps(record) + "\n")
+            if self.fsync_policy == "op":
+                self._segment.flush()
+                os.fsync(self._segment.fileno())
+                self.synced_seq = seq
+            elif self.fsync_policy == "interval":
+                self._segment.flush()
+        return seq
+
+    def sync(self, seq):
+        """Block until the record with this sequence number is on disk.
+
+        Only waits under the group policy; op has already synced and
+        interval accepts losing the last fsync_interval seconds.
+        """
+        if self.fsync_policy != "group" or self.synced_seq >= seq:
+            return
+        with self._sync_lock:
+            if self.synced_seq >= seq:
+                return
+            self._fsync()
+
+    def _fsync(self):
+        # fsync a duplicate descriptor outside the write lock so appends keep
+        # flowing, and a concurrent segment switch cannot close it under us
+        with self._write_lock:
+            target = self.last_seq
+            self._segment.flush()
+            fileno = os.dup(self._segment.fileno())
+        try:
+            os.fsync(fileno)
+        finally:
+            os.close(fileno)
+        self.synced_seq = max(self.synced_seq, target)
+
+    def _sync_periodically(self):
+        while not self._closed:
+            time.sleep(self.fsync_interval)
+            try:
+                if self.synced_seq < self.last_seq:
+                    with self._sync_lock:
+                        self._fsync()
+            except Exception as e:
+                logger.error(f"Error in periodic WAL fsync: {e}")
+
+    # Recovery
+
+    def replay(self, after_seq=0):
+        """Yield logged records with seq > after_seq, in order.
+
+        A torn final line left by a crash mid-write ends that segment;
+        records appended after the restart live in later segments.
+        """
+        for _, path in self._segments():
+            with open(path, "r", encoding="utf-8") as segment:
+                for line in segment:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Ignoring torn WAL record in {path}")
+                        break
+                    if record["seq"] > after_seq:
+                        yield record
+
+    def load_snapshot(self):
+        """Return (seq, state) from the latest snapshot, or (0, None)"""
+        path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0, None
+        with open(path, "r", encoding="utf-8") as snapshot:
+            payload = json.load(snapshot)
+        return payload["seq"], payload["state"]
+
+    def _read_snapshot_seq(self):
+        return self.load_snapshot()[0]
+
+    # Snapshots
+
+    def snapshot_due(self):
+        """True once snapshot_every records have been appended since the last snapshot"""
+        return self.snapshot_every > 0 and self.last_seq - self.snapshot_seq >= self.snapshot_every
+
+    def begin_snapshot(self):
+        """Start a new segment and return the seq the snapshot will cover.
+
+        Call while holding the lock that serializes appends with state
+        changes, so the state captured alongside matches this seq.
+        """
+        with self._write_lock:
+            seq = self.last_seq
+            self._open_segment(seq + 1)
+            self.synced_seq = max(self.synced_seq, seq)
+        return seq
+
+    def write_snapshot(self, seq, state):
+        """Durably store a snapshot taken at seq and drop the segments it covers"""
+        with self._snapshot_lock:
+            # An equal seq is still written: a replica resync replaces the
+            # state without appending anything locally
+            if seq < self.snapshot_seq:
+                return
+            path = os.path.join(self.directory, self.SNAPSHOT_FILE)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as snapshot:
+                json.dump({"seq": seq, "state": state}, snapshot, separators=(",", ":"))
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(tmp_path, path)
+            self.snapshot_seq = seq
+
+            for start_seq, segment_path in self._segments():
+                if start_seq <= seq:
+                    os.remove(segment_path)
+        logger.info(f"Wrote snapshot at seq {seq}")
+
+    def close(self):
+        with self._write_lock:
+            self._closed = True
+            self._segment.flush()
+            os.fsync(self._segment.fileno())
+            self._segment.close()